@@ -0,0 +1,117 @@
+#
+# Title: ConfusionSweep.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: TP/TN/FP/FN counts of every tested k (and weight), with the scores computed from them
+# Example: k, f1 = ConfusionSweep.load("k_testing/k_results_w3.npz").best_k("f1")
+#
+
+import os
+import numpy as np
+
+
+class ConfusionSweep:
+    metrics = ("accuracy", "precision", "recall", "f1")
+
+    def __init__(self, true_positives, true_negatives, false_positives, false_negatives, weights=(1,)):
+        """counts indexed [weight, k - 1], one row per weight in weights (a single row may be given as a 1-d array).
+           Positive means unhealthy, as in KNN.pick_k"""
+        counts = [np.asarray(c, dtype=np.int64).reshape(len(weights), -1) for c in
+                  (true_positives, true_negatives, false_positives, false_negatives)]
+        self.true_positives, self.true_negatives, self.false_positives, self.false_negatives = counts
+        self.weights = tuple(weights)
+
+
+    @property
+    def k_range(self):
+        return self.true_positives.shape[1]
+
+
+    @property
+    def samples(self):
+        """number of samples the counts are over"""
+        if self.true_positives.size == 0:
+            return 0
+        return int(self.true_positives[0, 0] + self.true_negatives[0, 0] + self.false_positives[0, 0] + self.false_negatives[0, 0])
+
+
+    def __add__(self, other):
+        """counts of both sweeps together, e.g. of two ranges of the validation set"""
+        if other.weights != self.weights or other.k_range != self.k_range:
+            raise ValueError("can only add sweeps over the same weights and k range")
+        return ConfusionSweep(self.true_positives + other.true_positives, self.true_negatives + other.true_negatives,
+                              self.false_positives + other.false_positives, self.false_negatives + other.false_negatives,
+                              self.weights)
+
+
+    def row(self, weight=None):
+        """index of weight in weights (the first weight if None)"""
+        return 0 if weight is None else self.weights.index(weight)
+
+
+    def accuracy(self):
+        return (self.true_positives + self.true_negatives) / max(self.samples, 1)
+
+
+    def precision(self):
+        with np.errstate(divide='ignore', invalid='ignore'):        # nan where nothing was guessed unhealthy
+            return self.true_positives / (self.true_positives + self.false_positives)
+
+
+    def recall(self):
+        with np.errstate(divide='ignore', invalid='ignore'):        # nan where nothing was unhealthy
+            return self.true_positives / (self.true_positives + self.false_negatives)
+
+
+    def f1(self):
+        precision, recall = self.precision(), self.recall()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return 2 * ((precision * recall) / (precision + recall))
+
+
+    def score(self, metric):
+        """(weights x k_range) array of one of metrics"""
+        return getattr(self, metric)()
+
+
+    def best_k(self, metric, weight=None):
+        """smallest k with the highest score of metric for weight, as (k, score).
+           (0, 0) if no k has a score above 0, like calculate_performance always reported"""
+        values = self.score(metric)[self.row(weight)]
+        values = np.where(np.isnan(values), 0, values)
+        if len(values) == 0 or values.max() <= 0:
+            return 0, 0
+        best = int(np.argmax(values))
+        return best + 1, float(values[best])
+
+
+    def best(self, metric):
+        """best (weight, k, score) of metric over every weight and k"""
+        results = [(weight,) + self.best_k(metric, weight) for weight in self.weights]
+        return max(results, key=lambda result: result[2])
+
+
+    def at(self, k, weight=None):
+        """scores of every metric and the counts for one k and weight, as a dict"""
+        i, j = self.row(weight), k - 1
+        result = {metric: float(self.score(metric)[i, j]) for metric in self.metrics}
+        result.update(true_positives=int(self.true_positives[i, j]), true_negatives=int(self.true_negatives[i, j]),
+                      false_positives=int(self.false_positives[i, j]), false_negatives=int(self.false_negatives[i, j]))
+        return result
+
+
+    def save(self, path):
+        """writes the counts to path (.npz), replacing any older file"""
+        with open(path + ".tmp", 'wb') as file:
+            np.savez(file, weights=np.array(self.weights), true_positives=self.true_positives,
+                     true_negatives=self.true_negatives, false_positives=self.false_positives,
+                     false_negatives=self.false_negatives)
+        os.replace(path + ".tmp", path)
+
+
+    @classmethod
+    def load(cls, path):
+        """reads counts written by save"""
+        with np.load(path) as saved:
+            return cls(saved["true_positives"], saved["true_negatives"], saved["false_positives"],
+                       saved["false_negatives"], tuple(saved["weights"].tolist()))
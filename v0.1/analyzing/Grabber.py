@@ -9,8 +9,11 @@
 import os
 import json
 import csv
-import random
+import numpy as np
 from Sample import Sample
+from SampleStore import SampleStore
+from SwitchSeries import SwitchSeries
+from FeatureEngine import FeatureEngine
 import re
 
 
@@ -19,9 +22,9 @@ class Grabber:
         self.database_dir = database_dir
         self.sample_len = sample_len
         
-        self.training = []
-        self.validation = []
-        self.small = []
+        self.training = SampleStore()                 # samples as rows of typed arrays, not lists of Sample objects
+        self.validation = SampleStore()
+        self.small = SampleStore()
 
         self.stats = ["temp_avg", "temp_max", "cpu_avg", "cpu_max", "latency_avg", "latency_max"]
         
@@ -35,8 +38,10 @@ class Grabber:
         self.upper_limits = {key + "_top": None for key in self.stats_full}
         self.lower_limits = {key + "_bot": None for key in self.stats_full}
 
+        self.engine = FeatureEngine()
+
         input_dir = self.database_dir + "/formatted/"
-        input_filenames = [f for f in os.listdir(input_dir) if os.path.isfile(os.path.join(input_dir, f))]
+        input_filenames = sorted(f for f in os.listdir(input_dir) if os.path.isfile(os.path.join(input_dir, f)))
 
         # i = 0
         for file in input_filenames:
@@ -109,6 +114,9 @@ class Grabber:
         skip = []                         # these periods will not be used as healthy or unhealthy data
                                                     # represents desired gap between down-events and healthy periods
         for switch in switches.values():
+            series = SwitchSeries(switch)                                   # dense arrays of this switch's stats, built once
+            sample_days = []                                                # end days and labels of this switch's samples
+            sample_healthy = []
             events = switch["events"]
             event_days_raw = [int(x) for x in events.keys()]
             event_days = [x for x in event_days_raw if x <= data_len]
@@ -130,7 +138,7 @@ class Grabber:
 
                         if (dist_from_event not in skip):                           # to create desired gap between down events and healthy periods
 
-                            valid = self.is_valid_sample(switch, end_day)  
+                            valid = self.is_valid_sample(series, end_day)  
                             
                             if valid:                                   # if sample is valid, find out if it's healthy or unhealthy before creation
                                 if (end_day == data_len):                    
@@ -147,13 +155,16 @@ class Grabber:
                                     healthy = True
                                     healthy_count += 1
                         
-                                self.make_sample(switch, end_day, healthy, data_len)
+                                sample_days.append(end_day)
+                                sample_healthy.append(healthy)
 
                         end_day = end_day - sample_len               # ready to check next potential sample in this period
                         dist_from_event += 1
                 
                 last_event_day = end_day                 # all potential samples in period have been checked; end day is now start of next period
 
+            self.make_samples(series, sample_days, sample_healthy, data_len)    # compute stats of all samples of this switch at once
+
         print("...Grabbed ", healthy_count, " healthy and ", unhealthy_count, " unhealthy...")
         return
     
@@ -161,50 +172,42 @@ class Grabber:
     # Function Name: is_valid_sample()
     # Description: check if this potential sample is valid by looking at preceding sample_len days
     #     
-    # Parameters: switch : Switch object
+    # Parameters: series : SwitchSeries object
     #             day : day of observation start
     # Return:
     #             valid : boolean indicating if sample is valid or not
-    def is_valid_sample(self, switch, day) -> bool:  
-
-        # create shallow copy of stats list, fixing the naming convention issue in our data
-        # can remove this later if we fix the data to report values as latency instead of ping_latency
-        stats = self.stats[:]
-        stats[4] = "ping_latency_avg"
-        stats[5] = "ping_latency_max"
-
-        valid = True
-        for cur_day in range(day - 1, day - self.sample_len - 1 , -1):
-            for stat in stats:                                          # for sample to be valid, all stats must be present
-                if str(cur_day) in switch[stat].keys():
-                    pass
-                else:
-                    valid = False
-                    return valid
-                
-        return valid
+    def is_valid_sample(self, series, day) -> bool:  
+
+        return series.is_complete(day, self.sample_len)                  # for sample to be valid, all stats must be present
   
     
-    # Function Name: make_sample() 
-    # Description: creates a new sample object, add it to training set and resets limits for stats if needed
+    # Function Name: make_samples() 
+    # Description: computes stats of all samples of a switch at once and makes a sample object of each
     #     
-    # Parameters: switch : Switch object
-    #             day : int day that we start iteration on
-    #             healthy : boolean indicating if switch is healthy or not
+    # Parameters: series : SwitchSeries object
+    #             days : list of int days that the samples end on
+    #             healthy : list of booleans indicating if switch is healthy or not
     # Return:   none
     #             
-    def make_sample(self, switch, day, healthy, data_len):
-        sample_len = self.sample_len
+    def make_samples(self, series, days, healthy, data_len):
+        features = self.engine.extract(series, days, self.sample_len)       # one row of stats per sample
 
-        model = switch["model"]
-        temp_avg = [float(switch["temp_avg"][str(x)]) for x in range(day - sample_len, day)]
-        temp_max = [int(switch["temp_max"][str(x)]) for x in range(day - sample_len, day)]
-        cpu_avg = [float(switch["cpu_avg"][str(x)]) for x in range(day - sample_len, day)]
-        cpu_max = [int(switch["cpu_max"][str(x)]) for x in range(day - sample_len, day)]
-        latency_avg = [int(switch["ping_latency_avg"][str(x)]) for x in range(day - sample_len, day)]
-        latency_max = [int(switch["ping_latency_max"][str(x)]) for x in range(day - sample_len, day)]
+        for day, row, row_healthy in zip(days, features, healthy):
+            self.make_sample(series, day, row, row_healthy, data_len)
+        return
 
-        new_sample = Sample(healthy, model, temp_avg, temp_max, cpu_avg, cpu_max, latency_avg, latency_max)
+
+    # Function Name: make_sample() 
+    # Description: creates a new sample object, copies it into the training or validation set and resets limits for stats if needed
+    #     
+    # Parameters: series : SwitchSeries object
+    #             day : int day that the sample ends on
+    #             features : row of stats computed by FeatureEngine
+    #             healthy : boolean indicating if switch is healthy or not
+    # Return:   none
+    #             
+    def make_sample(self, series, day, features, healthy, data_len):
+        new_sample = Sample.view(healthy, series.model, features)
     
         self.update_limits(new_sample)
 
@@ -269,37 +272,29 @@ class Grabber:
 
     
     # Function Name: small_set()
-    # Description: Create a smaller dataset with 50% healthy and 50% unhealthy samples 
-    #     
-    # Parameters: none
-    #     
+    # Description: Create a smaller dataset with 50% healthy and 50% unhealthy samples,
+    #     picked from one seeded shuffle of the training set (the rest stays in training)
+    # Parameters: 
+    #     seed: int, the same seed always picks the same samples (random if None)
     # Return: none
     #     
-    def small_set(self):
-        
-        size = len(self.training) - 1
+    def small_set(self, seed=None):
 
         healthy_quota = 5000
         unhealthy_quota = 5000
 
-        while (healthy_quota > 0 or unhealthy_quota > 0):           # while we still have some room left for healthy or unhealthy samples
-
-            index = random.randrange(0, size)                       
-            temp = self.training.pop(index)                         # pop a random sample from training set
-            size -= 1
-
-            if (temp.healthy == 1):                                 # if it is healthy and we have room, add it to smal set
-                if (healthy_quota > 0):
-                    self.small.append(temp)
-                    healthy_quota -= 1
-                else:                                               # else put it back to training set
-                    self.training.append(temp)      
-            else:
-                if (unhealthy_quota > 0):                           # if it is unhealthy and we have room, add it to smal set
-                    self.small.append(temp)
-                    unhealthy_quota -= 1
-                else:                                               # else put it back to training set
-                    self.training.append(temp)
+        order = np.random.default_rng(seed).permutation(len(self.training))
+        healthy = (self.training.healthy[:len(self.training)] == 1)[order]
+
+        chosen = np.zeros(len(self.training), dtype=bool)
+        chosen[order[healthy][:healthy_quota]] = True               # first healthy and unhealthy samples of the shuffle
+        chosen[order[~healthy][:unhealthy_quota]] = True
+
+        small = SampleStore(int(chosen.sum()))
+        small.extend_from(self.training, order[chosen[order]])                  # in shuffled order
+        training = SampleStore(len(self.training) - len(small))
+        training.extend_from(self.training, np.flatnonzero(~chosen))            # in original order
+        self.small, self.training = small, training
         
         return
 
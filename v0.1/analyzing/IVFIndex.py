@@ -0,0 +1,125 @@
+#
+# Title: IVFIndex.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: approximate nearest neighbour index, training rows grouped into lists around k-means centroids
+# Example: indices, distances = IVFIndex(engine.features).query(test_sample[2:], 173, nprobe=8)
+#
+
+import numpy as np
+
+
+class IVFIndex:
+    def __init__(self, features, lists=None, iterations=10, seed=0):
+        """groups the rows of features (rows x stats) into lists (about sqrt(rows) if None) by k-means"""
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        lists = max(1, min(lists or int(np.sqrt(len(features))), len(features)))
+        rng = np.random.default_rng(seed)
+        sample = features[rng.choice(len(features), min(len(features), lists * 64), replace=False)]
+        centroids = sample[:lists].copy()                           # centroids are fitted on a sample, 64 rows per list
+
+        for _ in range(iterations):
+            assigned = IVFIndex.nearest_centroid(sample, centroids)
+            sizes = np.bincount(assigned, minlength=lists)
+            sums = np.stack([np.bincount(assigned, weights=column, minlength=lists) for column in sample.T], axis=1)
+            filled = sizes > 0                                      # an empty list keeps its old centroid
+            centroids[filled] = sums[filled] / sizes[filled, None]
+        assigned = IVFIndex.nearest_centroid(features, centroids)
+
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.order = np.argsort(assigned, kind='stable')            # training rows, list by list
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(assigned, minlength=lists))))
+        self.features = features[self.order]                        # rows of a list are contiguous
+        self.norms = np.einsum('ij,ij->i', self.features, self.features)
+
+
+    @staticmethod
+    def nearest_centroid(features, centroids, step=65536):
+        """index of the closest centroid to every row, from |a|^2 + |b|^2 - 2ab in blocks of step rows"""
+        centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+        assigned = np.empty(len(features), dtype=np.intp)
+        for start in range(0, len(features), step):
+            dist = features[start:start + step] @ centroids.T
+            dist *= -2
+            dist += centroid_norms                                  # |a|^2 is the same for every centroid of a row
+            assigned[start:start + step] = dist.argmin(axis=1)
+        return assigned
+
+
+    def probes(self, query, k, nprobe):
+        """the lists searched for query: the nprobe with the closest centroids, and the next closest ones while they
+           hold fewer than k rows, so a search always finds k neighbours"""
+        diff = self.centroids - query
+        centroid_dist = np.einsum('ij,ij->i', diff, diff)
+        closest = np.argsort(centroid_dist, kind='stable')
+        filled = int(np.searchsorted(np.cumsum(np.diff(self.offsets)[closest]), k)) + 1
+        return closest[:max(nprobe, filled)]
+
+
+    def query(self, query, k, nprobe=8):
+        """returns the indices of (about) the k nearest training rows to query (stats only), nearest first, and their
+           distances, searching only the nprobe lists with the closest centroids. More probes, better recall, slower"""
+        query = np.asarray(query, dtype=np.float32)
+        probes = self.probes(query, k, nprobe)
+
+        positions = np.concatenate([np.arange(self.offsets[p], self.offsets[p + 1]) for p in probes])
+        rows = self.order[positions]
+        diff = self.features[positions] - query
+        dist = np.einsum('ij,ij->i', diff, diff)
+
+        nearest = np.lexsort((rows, dist))[:k]                      # by distance, then by training row, like exact search
+        return rows[nearest], np.sqrt(dist[nearest])
+
+
+    def batch_query(self, queries, k, nprobe=8):
+        """query for every row of queries at once, with the same neighbours, distances and tie order. Queries are
+           grouped by the lists they probe, so every list is searched with one matrix product for all of its queries
+           (|a|^2 + |b|^2 - 2ab), and the rows that can still be among the k nearest are then ranked exactly.
+           Returns (queries x k) arrays of row indices and distances"""
+        queries = np.ascontiguousarray(queries, dtype=np.float32).reshape(-1, self.features.shape[1])
+        k = min(k, len(self.order))
+        if k == 0 or len(queries) == 0:
+            return np.empty((len(queries), k), dtype=np.intp), np.empty((len(queries), k), dtype=np.float32)
+
+        probes = [self.probes(query, k, nprobe) for query in queries]
+        pair_queries = np.repeat(np.arange(len(queries)), [len(p) for p in probes])
+        pair_slots = np.concatenate([np.arange(len(p)) for p in probes])   # which of its probes the list is, per query
+        pair_lists = np.concatenate(probes)
+        by_list = np.argsort(pair_lists, kind='stable')                 # (query, list) pairs, list by list
+        pair_queries, pair_slots, pair_lists = pair_queries[by_list], pair_slots[by_list], pair_lists[by_list]
+        query_norms = np.einsum('ij,ij->i', queries, queries)
+
+        blocks = []
+        nearest = np.full((len(queries), max(len(p) for p in probes), k), np.inf, dtype=np.float32)
+        for group in np.split(np.arange(len(pair_lists)), np.flatnonzero(np.diff(pair_lists)) + 1):
+            probing = pair_queries[group]                               # the queries that search this list
+            first, last = self.offsets[pair_lists[group[0]]], self.offsets[pair_lists[group[0]] + 1]
+            dist = queries[probing] @ self.features[first:last].T
+            dist *= -2
+            dist += self.norms[first:last]
+            dist += query_norms[probing, None]
+            top = np.partition(dist, k - 1, axis=1)[:, :k] if last - first > k else dist
+            nearest[probing, pair_slots[group], :top.shape[1]] = top     # the k closest of every list a query probes
+            blocks.append((probing, first, dist))
+        kth = np.partition(nearest.reshape(len(queries), -1), k - 1, axis=1)[:, k - 1]
+
+        # the expansion is only accurate to a few float32 steps of the norms, so keep every row that may be
+        # within reach of the kth distance and rank those exactly
+        reach = kth + 1e-5 * (query_norms + self.norms.max() + 1)
+        found_queries, found_positions = [], []
+        for probing, first, dist in blocks:
+            rows, cols = np.nonzero(dist <= reach[probing, None])
+            found_queries.append(probing[rows])
+            found_positions.append(first + cols)
+
+        found_queries = np.concatenate(found_queries)
+        found_positions = np.concatenate(found_positions)
+        diff = self.features[found_positions] - queries[found_queries]
+        exact = np.einsum('ij,ij->i', diff, diff)
+        rows = self.order[found_positions]
+        order = np.lexsort((rows, exact, found_queries))               # by query, distance, then training row
+
+        counts = np.bincount(found_queries, minlength=len(queries))
+        start = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        take = order[(start[:, None] + np.arange(k)).ravel()].reshape(len(queries), k)
+        return rows[take], np.sqrt(exact[take])
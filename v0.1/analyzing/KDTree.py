@@ -0,0 +1,154 @@
+#
+# Title: KDTree.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: exact k nearest neighbour index over the KNN training stats, saved next to the dataset
+# Example: tree = KDTree.load_or_build(database_dir + "/training/training_" + dataset_name + ".kdtree.npz", features)
+#
+
+import hashlib
+import os
+import numpy as np
+
+
+class KDTree:
+    version = 1                 # bump when the layout of the saved index changes
+    leaf_size = 1024            # big leaves, so most of the work is vectorized distance blocks
+
+    def __init__(self, features, leaf_size=None):
+        """builds the tree over features (rows x stats), splitting the widest stat of every node at its median"""
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        self.leaf_size = leaf_size or KDTree.leaf_size
+        self.checksum = KDTree.fingerprint(features)
+
+        order = np.arange(len(features))
+        lo, hi, start, end, left, right = [], [], [], [], [], []
+
+        pending = [(0, len(features), -1, None)]                    # (start, end, parent, is left child)
+        while pending:
+            first, last, parent, is_left = pending.pop()
+            node = len(start)
+            rows = features[order[first:last]]
+            lo.append(rows.min(axis=0) if len(rows) else np.zeros(features.shape[1], dtype=np.float32))
+            hi.append(rows.max(axis=0) if len(rows) else np.zeros(features.shape[1], dtype=np.float32))
+            start.append(first)
+            end.append(last)
+            left.append(-1)
+            right.append(-1)
+            if parent >= 0:
+                (left if is_left else right)[parent] = node
+
+            if last - first > self.leaf_size:
+                dim = int(np.argmax(hi[node] - lo[node]))
+                middle = (last - first) // 2
+                split = np.argpartition(rows[:, dim], middle, kind='introselect')
+                order[first:last] = order[first:last][split]
+                pending.append((first + middle, last, node, False))
+                pending.append((first, first + middle, node, True))
+
+        self.order = order                                          # training row of every tree position
+        self.features = features                                    # read through order, never copied
+        self.lo = np.array(lo, dtype=np.float32)                    # bounding box of every node
+        self.hi = np.array(hi, dtype=np.float32)
+        self.start = np.array(start, dtype=np.int64)
+        self.end = np.array(end, dtype=np.int64)
+        self.left = np.array(left, dtype=np.int64)                  # -1 for leaves
+        self.right = np.array(right, dtype=np.int64)
+
+
+    @staticmethod
+    def fingerprint(features):
+        """hash of the training stats, an index is only reused for the exact rows it was built from.
+           Hashed a block of rows at a time, so a memmapped matrix is never read into memory whole"""
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        digest = hashlib.sha1()
+        for first in range(0, len(features), 65536):
+            digest.update(memoryview(features[first:first + 65536]).cast('B'))
+        return digest.hexdigest()
+
+
+    def box_distance(self, node, query):
+        """squared distance from query to the closest point of the node's bounding box"""
+        gap = np.maximum(self.lo[node] - query, 0) + np.maximum(query - self.hi[node], 0)
+        return float(np.dot(gap, gap))
+
+
+    def query(self, query, k):
+        """returns the indices of the k nearest training rows to query (stats only), nearest first, and their distances.
+           Same result and tie order as KNNEngine.neighbours, nodes that can not beat the kth distance are skipped"""
+        query = np.asarray(query, dtype=np.float32)
+        k = min(k, len(self.order))
+        best = np.empty(0, dtype=np.int64)                          # training rows, nearest first
+        best_dist = np.empty(0, dtype=np.float32)
+        kth = np.inf
+
+        pending = [(0.0, 0)]
+        while pending:
+            reach, node = pending.pop()
+            if reach > kth * (1 + 1e-5) + 1e-12:                    # slack for float32 rounding, so ties are never pruned
+                continue
+
+            if self.left[node] < 0:
+                first, last = self.start[node], self.end[node]
+                rows = self.order[first:last]
+                diff = self.features[rows] - query                  # gathers this leaf's rows only
+                dist = np.einsum('ij,ij->i', diff, diff)
+                if len(best) == k:                                  # only rows that can still make the cut
+                    close = dist <= kth
+                    if not close.any():
+                        continue
+                    rows, dist = rows[close], dist[close]
+                rows = np.concatenate((best, rows))
+                dist = np.concatenate((best_dist, dist))
+                keep = np.lexsort((rows, dist))[:k]                 # by distance, then by training row
+                best, best_dist = rows[keep], dist[keep]
+                if len(best) == k:
+                    kth = best_dist[-1]
+                continue
+
+            near, far = self.left[node], self.right[node]
+            near_reach, far_reach = self.box_distance(near, query), self.box_distance(far, query)
+            if far_reach < near_reach:
+                near, far = far, near
+                near_reach, far_reach = far_reach, near_reach
+            pending.append((far_reach, far))                        # visit the nearer child first
+            pending.append((near_reach, near))
+
+        return best, np.sqrt(best_dist)
+
+
+    def save(self, path):
+        """writes the index to path (.npz), replacing any older index"""
+        with open(path + ".tmp", 'wb') as file:
+            np.savez(file, version=self.version, leaf_size=self.leaf_size, checksum=self.checksum, order=self.order,
+                     lo=self.lo, hi=self.hi, start=self.start, end=self.end, left=self.left, right=self.right)
+        os.replace(path + ".tmp", path)
+
+
+    @classmethod
+    def load(cls, path, features):
+        """reads an index written by save, returns None if it is missing or was built from other rows"""
+        if not os.path.exists(path):
+            return None
+
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        with np.load(path) as saved:
+            if int(saved["version"]) != cls.version or str(saved["checksum"]) != KDTree.fingerprint(features):
+                return None
+            tree = cls.__new__(cls)
+            tree.leaf_size = int(saved["leaf_size"])
+            tree.checksum = str(saved["checksum"])
+            for key in ("order", "lo", "hi", "start", "end", "left", "right"):
+                setattr(tree, key, saved[key])
+        tree.features = features
+        return tree
+
+
+    @classmethod
+    def load_or_build(cls, path, features):
+        """loads the index at path, or builds it and saves it there if it is missing or out of date"""
+        tree = cls.load(path, features)
+        if tree is None:
+            tree = cls(features)
+            tree.save(path)
+        return tree
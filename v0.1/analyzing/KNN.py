@@ -7,82 +7,146 @@
 
 from math import sqrt
 import csv
+import numpy as np
+from KNNEngine import KNNEngine
+from IVFIndex import IVFIndex
+from QuantizedEngine import QuantizedEngine
+from TrainingCache import TrainingCache
+from NeighbourGraph import NeighbourGraph
+from ConfusionSweep import ConfusionSweep
+import os
+import time
 import re
 
 
 class KNN:
-    def __init__(self, database_dir, dataset_name, weight = 1):
+    def __init__(self, database_dir, dataset_name, weight = 1, use_index = False, nprobe = None, precision = "float32"):
         self.database_dir = database_dir
         self.dataset_name = dataset_name
 
         self.weight = weight
         self.dataset = self.file_to_dataset()
-
-    def file_to_dataset(self) -> list:
-        """read from csv file and return this data as a list"""
+        if precision == "float32":                          # neighbour search over the mapped stats
+            self.engine = KNNEngine(self.dataset.features, self.dataset.labels)
+        else:                                               # smaller in memory, see precision_report
+            self.engine = QuantizedEngine(self.dataset.features, self.dataset.labels, precision)
+        if use_index and precision == "float32":            # opt-in KDTree (no faster than the blocked scan below ~100k
+                                                            # rows), saved next to the dataset, built on first use, over
+                                                            # float32 stats only (quantized stats are searched directly)
+            self.engine.use_index(self.database_dir + "/training/training_" + self.dataset_name + ".kdtree.npz")
+        if nprobe:                                          # approximate search, see measure_approximate for picking nprobe
+            self.engine.use_approximate(nprobe)
+
+    def file_to_dataset(self) -> TrainingCache:
+        """opens the training csv through its float32 cache, rebuilt only when the csv has changed"""
 
         path = self.database_dir + "/training/training_" + self.dataset_name + ".csv"
-        dataset = []
-        healthy_count = 0
-        unhealthy_count = 0
+        return TrainingCache(path)
+
+
+    def predict(self, test_sample, k):
+        """performs KNN algorigthm with k value on test_sample """
 
-        # training_size = 10000
+        nearest, _ = self.engine.neighbours(test_sample[2:], k)
 
+        healthy_sum = int(self.engine.labels[nearest].sum())            # labels are 1 for healthy
+        unhealthy_sum = len(nearest) - healthy_sum
+
+        if (self.weight * healthy_sum) > unhealthy_sum:
+            return 1
+        else:
+            return 0
+        
+        
+    def predict_batch(self, samples, k, memory_budget=None):
+        """performs KNN algorithm with k value on every row of samples (same layout as test_sample) at once,
+           returns arrays of predictions (1 healthy, 0 unhealthy), healthy votes and unhealthy votes"""
+
+        samples = np.asarray(samples, dtype=np.float64).reshape(len(samples), -1)
+        nearest, _ = self.engine.batch_neighbours(samples[:, 2:], k, memory_budget)
+
+        healthy_votes = self.engine.labels[nearest].sum(axis=1, dtype=np.int64)
+        unhealthy_votes = nearest.shape[1] - healthy_votes
+        predictions = (self.weight * healthy_votes > unhealthy_votes).astype(np.int8)
+
+        return predictions, healthy_votes, unhealthy_votes
+
+
+    def measure_approximate(self, validation_set, k, nprobes=(1, 2, 4, 8, 16, 32, 64)):
+        """compares approximate search with every probe count in nprobes against exact search on the validation set.
+           Prints and returns (nprobe, neighbour recall, prediction agreement, ms per sample) for each probe count"""
+
+        path = self.database_dir + "/training/" + validation_set + ".csv"
         with open(path, 'r', newline='') as file:
-            reader = csv.reader(file)
+            samples = np.array([[float(val) for val in row] for row in csv.reader(file)], dtype=np.float64)
+        queries = samples[:, 2:]
 
-            for i, row in enumerate(reader):
-                # if i >= training_size:
-                #     break
+        start = time.perf_counter()
+        exact, _ = self.engine.batch_neighbours(queries, k, exact=True)
+        exact_ms = (time.perf_counter() - start) / len(queries) * 1000
+        exact_votes = self.engine.labels[exact].sum(axis=1)
+        exact_predictions = self.weight * exact_votes > exact.shape[1] - exact_votes
 
-                sample = [float(val) for val in row]
+        index = self.engine.approximate                     # built just for this measurement if the engine has none,
+        if index is None:                                   # so later searches stay exact
+            index = IVFIndex(self.engine.features)
+        results = []
+        print(f"Exact search: {exact_ms:.3f} ms per sample")
+        print(f"{'nprobe':>8} {'recall':>8} {'agree':>8} {'ms':>8}")
 
-                if sample[0] == 1:
-                    healthy_count += 1
-                else:
-                    unhealthy_count += 1
+        for nprobe in nprobes:
+            start = time.perf_counter()
+            approximate, _ = index.batch_query(queries, k, nprobe)
+            ms = (time.perf_counter() - start) / len(queries) * 1000
 
-                dataset.append(sample)
+            found = [len(np.intersect1d(a, e)) for a, e in zip(approximate, exact)]
+            recall = sum(found) / exact.size
+            votes = self.engine.labels[approximate].sum(axis=1)
+            agreement = np.mean((self.weight * votes > approximate.shape[1] - votes) == exact_predictions)
 
-        return dataset 
+            print(f"{nprobe:>8} {recall:>8.4f} {agreement:>8.4f} {ms:>8.3f}")
+            results.append((nprobe, recall, agreement, ms))
 
+        return results
 
-    def predict(self, test_sample, k):
-        """performs KNN algorigthm with k value on test_sample """
 
-        nn = self.get_nn(test_sample, k)
+    def precision_report(self, validation_set, k, precisions=("float32", "float16", "int8"), query_count=200):
+        """compares keeping the training stats (as read from the float32 cache) as each of precisions against
+           searching them in float64, on the first query_count samples of the validation set. Prints and returns
+           (precision, bytes, ms per sample, neighbour overlap, prediction agreement) for each"""
 
-        healthy_sum = 0
-        unhealthy_sum = 0
+        path = self.database_dir + "/training/" + validation_set + ".csv"
+        queries = np.loadtxt(path, delimiter=',', dtype=np.float64, ndmin=2)[:query_count, 2:]
 
-        for n_sample in nn:
-            vote = n_sample[0]
+        results = []
+        reference = None
+        print(f"{'storage':>8} {'MiB':>8} {'ms':>8} {'overlap':>8} {'agree':>8}")
+
+        for precision in ("float64",) + tuple(precisions):
+            engine = QuantizedEngine(self.dataset.features, self.dataset.labels, precision)     # from the mapped cache
+
+            start = time.perf_counter()
+            nearest, _ = engine.batch_neighbours(queries, k)
+            ms = (time.perf_counter() - start) / len(queries) * 1000
+
+            votes = engine.labels[nearest].sum(axis=1)
+            predictions = self.weight * votes > nearest.shape[1] - votes
+            if reference is None:
+                reference = (nearest, predictions)
+            overlap = np.mean([len(np.intersect1d(n, r)) / max(len(r), 1) for n, r in zip(nearest, reference[0])])
+            agreement = np.mean(predictions == reference[1])
+
+            print(f"{precision:>8} {engine.nbytes / 2**20:>8.2f} {ms:>8.3f} {overlap:>8.4f} {agreement:>8.4f}")
+            results.append((precision, engine.nbytes, ms, overlap, agreement))
+
+        return results
 
-            if vote == 1:
-                healthy_sum += 1
-            else:
-                unhealthy_sum += 1
 
-        if (self.weight * healthy_sum) > unhealthy_sum:
-            return 1
-        else:
-            return 0
-        
-        
     def get_nn(self, test_sample, k):
         """gets a list of k nearest neighbours to the test sample"""
 
-        distances = list()
-        for train_sample in self.dataset:
-            dist = self.distance(test_sample, train_sample)
-            distances.append((train_sample, dist))
-            distances.sort(key=lambda tup: tup[1])
-            nn = list()
-            
-        for i in range(k):
-            nn.append(distances[i][0])
-            
-        return nn
+        nearest, _ = self.engine.neighbours(test_sample[2:], k)
+        return [self.dataset.row(i) for i in nearest]
    
     def distance(self, sample1, sample2):
         """calculates and returns euclidean distance between sample1 and sample 2"""
@@ -107,138 +171,77 @@ class KNN:
             for row in reader:
                 sample = [float(val) for val in row]
                 validation.append(sample)
-        
-        true_positives = [0]*k_range
-        true_negatives = [0]*k_range
-        false_positives = [0]*k_range
-        false_negatives = [0]*k_range
-        total_samples = end - start + 1
-
-        for i, sample in enumerate(validation):
-
-            if (i < start):
-                continue
-
-            if (i > end):
-                break
-
-            print("...Comparing k options on sample", (i + 1), "...")
-
-            # get k_range nearest neighbors
-            nn = self.get_nn(sample, k_range)
-
-            # gather their votes
-            votes = [0]*k_range
-            for index, n_sample in enumerate(nn):
-                vote = n_sample[0]
-                if vote == 1:
-                    votes[index] = 1
-                else:
-                    votes[index] = 0
-
-            # see who wins at different thresholds
-            for k in range(0, k_range):
-
-                healthy_sum = 0
-                unhealthy_sum = 0
-
-                j = 0
-                while j < (k + 1):  
-                    vote = votes[j]
-                    if vote == 1:
-                        healthy_sum += 1
-                    else:
-                        unhealthy_sum += 1
-                    j += 1
-
-                if( self.weight * healthy_sum) > unhealthy_sum:     # that k value guessed healthy
-                    if sample[0] == 1:
-                        true_negatives[k] += 1
-                    else:
-                        false_negatives[k] += 1
-                else:                               # that k value guessed unhealthy
-                    if sample[0] == 0:
-                        true_positives[k] += 1
-                    else:
-                        false_positives[k] += 1
-
-        self.results_to_file(true_positives, true_negatives, false_positives, false_negatives, (start+1), (end+1))
+
+        print("...Comparing k options on samples", (start + 1), "to", min(end + 1, len(validation)), "...")
+
+        sweep = self.confusion_sweep(validation[start:end + 1], k_range)
+
+        self.sweep_to_file(sweep)
 
         return
 
-    def results_to_file(self, true_positives, true_negatives, false_positives, false_negatives, start, end):
-        """writes the sum of all true positive, true negative, false positive and false negative values
-           that we received after testing multiple k to the file"""
-        
-        filename = "k_testing/k_results_w" + str(self.weight) + ".csv"
 
-    
-        with open(filename, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow([f"Samples {start}-{end} Inclusive: TP"] + true_positives)
-            writer.writerow([f"Samples {start}-{end} Inclusive: TN"] + true_negatives)
-            writer.writerow([f"Samples {start}-{end} Inclusive: FP"] + false_positives)
-            writer.writerow([f"Samples {start}-{end} Inclusive: FN"] + false_negatives)
+    def confusion_sweep(self, samples, k_range, memory_budget=None):
+        """counts true positives, true negatives, false positives and false negatives of every k from 1 to k_range
+           over all rows of samples at once, returns a ConfusionSweep"""
+
+        return self.engine.confusion_sweep(samples, k_range, self.weight, memory_budget)
+
+    def sweep_path(self):
+        return "k_testing/k_results_w" + str(self.weight) + ".npz"
+
+
+    def sweep_to_file(self, sweep):
+        """adds the counts of sweep to the counts of earlier pick_k runs with the same weight (k_testing/k_results_w*.npz)"""
+
+        path = self.sweep_path()
+        if os.path.exists(path):
+            sweep = ConfusionSweep.load(path) + sweep
+        sweep.save(path)
 
         print("Done writing results to file.")
 
         return
 
 
-    def calculate_performance(self, true_positives, true_negatives, false_positives, false_negatives, total_samples, k_range):
-        """calculates performance values (precision, recall, accuracy, f1) for all tested k values
-           and prints the best k and best result to the console"""
-        best_accuracy = 0
-        best_a_k = 0
-        best_precision = 0
-        best_p_k = 0
-        best_recall = 0
-        best_r_k = 0
-        best_f1 = 0
-        best_f_k = 0
-        
-        for i in range(k_range):
-            accuracy = (true_positives[i] + true_negatives[i]) / total_samples
-
-            if true_positives[i] == 0 and false_positives[i] == 0:
-                precision = None
-            else:
-                precision = true_positives[i] / (true_positives[i] + false_positives[i])
-
-            if true_positives[i] == 0 and false_negatives[i] == 0:
-                recall = None
-            else:
-                recall = true_positives[i] / (true_positives[i] + false_negatives[i])
-
-            if precision and recall:
-                f1 = 2 * ((precision * recall) / (precision + recall))
-            else:
-                f1 = None
-            
-            if (accuracy > best_accuracy):
-                best_accuracy = accuracy
-                best_a_k = i+1
-            if precision and (precision > best_precision):
-                best_precision = precision
-                best_p_k = i+1
-            if recall and (recall > best_recall):
-                best_recall = recall
-                best_r_k = i+1
-            if f1 and (f1 > best_f1):
-                best_f1 = f1
-                best_f_k = i+1
+    def calculate_performance(self, sweep, weight=None):
+        """prints the best k and best result for every performance value (accuracy, precision, recall, f1)
+           of a ConfusionSweep, for weight (the first weight of the sweep if None)"""
+        best_a_k, best_accuracy = sweep.best_k("accuracy", weight)
+        best_p_k, best_precision = sweep.best_k("precision", weight)
+        best_r_k, best_recall = sweep.best_k("recall", weight)
+        best_f_k, best_f1 = sweep.best_k("f1", weight)
             
         print(f"""
         Best k for accuracy was {best_a_k} with {best_accuracy}
         Best k for precision was {best_p_k} with {best_precision}
         Best k for recall was {best_r_k} with {best_recall}
         Best k for F1 was {best_f_k} with {best_f1}
-        Per {total_samples} total samples""")
+        Per {sweep.samples} total samples""")
+
+
+    def leave_one_out(self, k_max, weights=(1, 2, 3, 4, 5)):
+        """scores every training sample against the other training samples for every k up to k_max and every weight,
+           from the k_max-nearest-neighbour graph of the training set (built once, saved next to the dataset).
+           Prints the best k of every weight and returns the ConfusionSweep"""
+
+        path = self.database_dir + "/training/training_" + self.dataset_name + ".graph.npz"
+        graph = NeighbourGraph.load_or_build(path, self.engine, k_max)
+        sweep = graph.confusion(self.engine.labels, weights)
+
+        for weight in weights:
+            print(f"Weight {weight}:")
+            for metric, name in zip(ConfusionSweep.metrics, ("accuracy", "precision", "recall", "F1")):
+                best_k, best = sweep.best_k(metric, weight)
+                print(f"        Best k for {name} was {best_k} with {best}")
+        print(f"Per {sweep.samples} training samples, each left out of its own neighbours")
+
+        return sweep
 
 
     def read_results(self, filepath, k_range):
-        """reads from csv file at filepath, stores all the values (TP, TN, FP, FN) to 4 separate lists and 
-        returns them and number of total samples """
+        """legacy converter: reads a k_results_w*.csv file written by pick_k before sweeps were kept as ConfusionSweep,
+        adds up all the values (TP, TN, FP, FN) and returns them as a ConfusionSweep, e.g. to .save(sweep_path())"""
         true_positives = [0]*k_range
         true_negatives = [0]*k_range
         false_positives = [0]*k_range
@@ -271,52 +274,36 @@ class KNN:
                     for i in range(k_range):
                         false_negatives[i] += values[i] 
 
-        return true_positives, true_negatives, false_positives, false_negatives, total_samples
+        return ConfusionSweep(true_positives, true_negatives, false_positives, false_negatives, (self.weight,))
 
   
-    def read_k_file(self, start, end):
-        """read from the csv file to determine which k has the highest correct count"""
-
-        start = start-1
-        end = end-1
-
-        totals = [0]*400
-
-        with open('k_correct_counts_weighted.csv', 'r') as file:
-            reader = csv.reader(file)
+    def load_sweep(self):
+        """the counts saved by pick_k (k_testing/k_results_w*.npz). If only a csv from before sweeps were kept as
+           ConfusionSweep is there, it is converted with read_results and saved as the npz first"""
+
+        path = self.sweep_path()
+        if not os.path.exists(path):
+            legacy = path[:-len(".npz")] + ".csv"
+            if not os.path.exists(legacy):
+                raise FileNotFoundError(f"no k results at {path} or {legacy}, run pick_k first")
+            with open(legacy, 'r') as file:
+                first = next(csv.reader(file), None)
+            k_range = len(first) - 1 if first else 0               # one column per k after the details
+            self.read_results(legacy, k_range).save(path)
+        return ConfusionSweep.load(path)
 
-            for i, row in enumerate(reader):
-                if i < start:
-                    continue
-                if i > end:
-                    break
 
-                values = list(map(int, row[1:]))
-
-                for i, value in enumerate(values):
-                    totals[i] += value
-        
-        most_correct = max(totals)
-        best_k = totals.index(most_correct) + 1
-
-        print("Best k value was ", best_k, " with ", most_correct, " correct.")
-
-        return
-    
     def test_quality(self, k):
 
-        true_positives, true_negatives, false_positives, false_negatives, total_samples = self.read_results("k_testing/k_results_w4.csv", 400)
+        sweep = self.load_sweep()
+        result = sweep.at(k)
         print("For ", k)
-        accuracy = (true_positives[k] + true_negatives[k]) / total_samples
-        precision = true_positives[k] / (true_positives[k] + false_positives[k])
-        recall = true_positives[k] / (true_positives[k] + false_negatives[k])
-        f1 = 2 * ((precision * recall) / (precision + recall))
-
-        print(f"""Accuracy is {accuracy}
-                Precision is {precision}
-                Recall is {recall}
-                F1 is {f1}
-                Per {total_samples} total samples""")
+
+        print(f"""Accuracy is {result["accuracy"]}
+                Precision is {result["precision"]}
+                Recall is {result["recall"]}
+                F1 is {result["f1"]}
+                Per {sweep.samples} total samples""")
         
-        print("There were", true_positives[k], "true positives")
-        print("There were", false_negatives[k], "false negatives")
+        print("There were", result["true_positives"], "true positives")
+        print("There were", result["false_negatives"], "false negatives")
@@ -0,0 +1,181 @@
+#
+# Title: KNNEngine.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: brute force nearest neighbour search over a contiguous float32 feature matrix
+# Example: indices, distances = KNNEngine.from_rows(dataset).neighbours(test_sample[2:], 173)
+#
+
+import numpy as np
+from KDTree import KDTree
+from IVFIndex import IVFIndex
+from ConfusionSweep import ConfusionSweep
+
+
+class KNNEngine:
+    memory_budget = 256 * 2**20                 # bytes of distance block a batch query may use at once
+
+    def __init__(self, features, labels):
+        """features: (rows x stats) matrix of normalized stats, labels: 1 for healthy rows, 0 for unhealthy"""
+        self.features = np.ascontiguousarray(features, dtype=np.float32)
+        self.labels = np.ascontiguousarray(labels, dtype=np.int8)
+        self.norms = np.einsum('ij,ij->i', self.features, self.features)     # squared length of every row
+        self.index = None                                                   # KDTree used by neighbours, if loaded
+        self.approximate = None                                             # IVFIndex used instead, if set
+        self.nprobe = 8
+
+
+    @classmethod
+    def from_rows(cls, rows):
+        """builds the engine from rows of our csv files (label, model, stats...)"""
+        data = np.asarray(rows, dtype=np.float64).reshape(len(rows), -1)
+        return cls(data[:, 2:], data[:, 0])
+
+
+    def use_index(self, path):
+        """loads the KDTree saved at path (building and saving it first if needed) and uses it for single queries"""
+        self.index = KDTree.load_or_build(path, self.features)
+
+
+    def use_approximate(self, nprobe=8, lists=None):
+        """makes neighbours search only the nprobe closest lists of an IVFIndex, trading exactness for speed"""
+        if self.approximate is None or (lists is not None and lists != len(self.approximate.centroids)):
+            self.approximate = IVFIndex(self.features, lists)
+        self.nprobe = nprobe
+
+
+    def __len__(self):
+        return len(self.labels)
+
+
+    def squared_distances(self, query):
+        """squared euclidean distance from query (stats only) to every training row"""
+        diff = self.features - np.asarray(query, dtype=np.float32)
+        return np.einsum('ij,ij->i', diff, diff)
+
+
+    def neighbours(self, query, k):
+        """returns the indices of the k nearest rows to query (stats only), nearest first, and their distances.
+           Rows at equal distance keep their order in the training set, like a stable sort of all rows would"""
+        if self.approximate is not None:
+            return self.approximate.query(query, k, self.nprobe)
+        if self.index is not None:
+            return self.index.query(query, k)
+        return self.scan(query, k)
+
+
+    def scan(self, query, k):
+        """neighbours of query out of all training rows, without any index"""
+        dist = self.squared_distances(query)
+        k = min(k, len(dist))
+        if k == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+
+        if k < len(dist):
+            kth = dist[np.argpartition(dist, k - 1)[k - 1]]
+            candidates = np.flatnonzero(dist <= kth)                    # in row order, ties at the kth distance included
+        else:
+            candidates = np.arange(len(dist))
+
+        nearest = candidates[np.argsort(dist[candidates], kind='stable')[:k]]
+        return nearest, np.sqrt(dist[nearest])
+
+
+    def chunk_size(self, memory_budget=None):
+        """number of queries whose distance block (with its partitioned copy and mask) fits in memory_budget bytes"""
+        budget = self.memory_budget if memory_budget is None else memory_budget
+        row_bytes = max(len(self), 1) * (4 + 8)
+        return max(1, budget // row_bytes)
+
+
+    def batch_neighbours(self, queries, k, memory_budget=None, exact=False):
+        """k nearest rows of every query (rows of stats only), nearest first, in blocks that fit in memory_budget.
+           Same neighbours, distances and tie order as neighbours: with an approximate index only the probed lists are
+           searched (IVFIndex.batch_query), otherwise, or if exact is set, every row is (scan_block).
+           Returns (queries x k) arrays of row indices and distances"""
+        queries = np.asarray(queries)
+        queries = queries.reshape(-1, queries.shape[-1])
+        k = min(k, len(self))
+        indices = np.empty((len(queries), k), dtype=np.intp)
+        distances = np.empty((len(queries), k), dtype=np.float32)
+        if k == 0 or len(queries) == 0:
+            return indices, distances
+
+        step = self.chunk_size(memory_budget)
+        for start in range(0, len(queries), step):
+            block = queries[start:start + step]
+            if self.approximate is not None and not exact:
+                found = self.approximate.batch_query(block, k, self.nprobe)
+            else:
+                found = self.scan_block(block, k)
+            indices[start:start + step], distances[start:start + step] = found
+
+        return indices, distances
+
+
+    def scan_block(self, block, k):
+        """k nearest rows of every query of block out of all training rows. Candidates come from |a|^2 + |b|^2 - 2ab,
+           one matrix product for the block, and are then ranked by the same exact distances and tie order as neighbours"""
+        block = np.ascontiguousarray(block, dtype=np.float32)
+        block_norms = np.einsum('ij,ij->i', block, block)
+        dist = block @ self.features.T
+        dist *= -2
+        dist += self.norms
+        dist += block_norms[:, None]
+
+        # the expansion is only accurate to a few float32 steps of the norms, so keep every row that may be
+        # within reach of the kth distance and rank those exactly
+        kth = np.partition(dist, k - 1, axis=1)[:, k - 1]
+        reach = kth + 1e-5 * (block_norms + self.norms.max() + 1)
+        rows, cols = np.nonzero(dist <= reach[:, None])                     # by query, then by training row
+
+        diff = self.features[cols] - block[rows]
+        exact = np.einsum('ij,ij->i', diff, diff)
+        order = np.lexsort((cols, exact, rows))                             # by query, distance, then training row
+
+        counts = np.bincount(rows, minlength=len(block))
+        first = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        take = order[(first[:, None] + np.arange(k)).ravel()].reshape(len(block), k)
+        return cols[take], np.sqrt(exact[take])
+
+
+    def vote_sweep(self, nearest, distances=None):
+        """healthy and unhealthy votes of every query for every k from 1 to nearest.shape[1], as (queries x k) arrays.
+           Every neighbour votes 1, or 1/distance if distances are given (a neighbour at distance 0 votes 1)"""
+        healthy = self.labels[nearest] == 1
+        if distances is None:
+            votes = np.ones(nearest.shape)
+        else:
+            votes = distances.astype(np.float64)
+            votes[votes == 0] = 1
+            votes = 1 / votes
+        healthy_votes = np.cumsum(np.where(healthy, votes, 0), axis=1)         # column k-1 holds the votes of the k nearest
+        unhealthy_votes = np.cumsum(np.where(healthy, 0, votes), axis=1)
+        return healthy_votes, unhealthy_votes
+
+
+    def confusion_sweep(self, samples, k_range, weight=1, memory_budget=None):
+        """counts true positives, true negatives, false positives and false negatives of every k from 1 to k_range
+           over all rows of samples (label, model, stats...) at once, healthy votes count weight times.
+           Returns a ConfusionSweep"""
+
+        samples = np.asarray(samples, dtype=np.float64).reshape(len(samples), -1)
+        counts = np.zeros((4, k_range), dtype=np.int64)
+        step = self.chunk_size(memory_budget)
+
+        for first in range(0, len(samples), step):
+            block = samples[first:first + step]
+            nearest, _ = self.batch_neighbours(block[:, 2:], k_range, memory_budget)
+            healthy_votes, unhealthy_votes = self.vote_sweep(nearest)
+
+            guessed_healthy = weight * healthy_votes > unhealthy_votes             # (samples x k), what every k guessed
+            healthy = (block[:, 0] == 1)[:, None]
+            width = guessed_healthy.shape[1]
+
+            counts[0, :width] += (~guessed_healthy & ~healthy).sum(axis=0)         # guessed unhealthy, was unhealthy
+            counts[1, :width] += (guessed_healthy & healthy).sum(axis=0)           # guessed healthy, was healthy
+            counts[2, :width] += (~guessed_healthy & healthy).sum(axis=0)          # guessed unhealthy, was healthy
+            counts[3, :width] += (guessed_healthy & ~healthy).sum(axis=0)          # guessed healthy, was unhealthy
+
+        true_positives, true_negatives, false_positives, false_negatives = counts
+        return ConfusionSweep(true_positives, true_negatives, false_positives, false_negatives, (weight,))
@@ -0,0 +1,121 @@
+#
+# Title: KSelection.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: picks k by sweeping the whole validation set over a pool of processes
+# Example: KSelection(knn, workers=8, checkpoint_path="k_testing/sweep_w3.npz").run("validation_2023-1-1_2023-12-31", 400)
+#
+
+import csv
+import json
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from KNNEngine import KNNEngine
+from ConfusionSweep import ConfusionSweep
+
+
+engine = None           # each worker's view of the shared training set, set by attach
+blocks = None           # the shared memory blocks under it, kept open for the life of the worker
+
+
+def attach(features_name, labels_name, rows, width):
+    """worker initializer, wraps the shared training arrays in an engine without copying them"""
+    global engine, blocks
+    blocks = (shared_memory.SharedMemory(name=features_name), shared_memory.SharedMemory(name=labels_name))
+    features = np.ndarray((rows, width), dtype=np.float32, buffer=blocks[0].buf)
+    labels = np.ndarray(rows, dtype=np.int8, buffer=blocks[1].buf)
+    features.flags.writeable = False
+    engine = KNNEngine(features, labels)
+
+
+def sweep_shard(samples, k_range, weight):
+    """confusion counts of one shard of the validation set, as a ConfusionSweep"""
+    return engine.confusion_sweep(samples, k_range, weight)
+
+
+class KSelection:
+    def __init__(self, knn, workers=None, shard_size=1000, checkpoint_path=None):
+        """knn: KNN whose training set and weight are used
+           workers: number of processes (all cores if None)
+           shard_size: validation samples per task
+           checkpoint_path: .npz file to keep finished shards in, so an interrupted sweep can resume (none if None)"""
+        self.knn = knn
+        self.workers = workers or os.cpu_count()
+        self.shard_size = shard_size
+        self.checkpoint_path = checkpoint_path
+
+
+    def run(self, validation_set, k_range):
+        """sweeps k from 1 to k_range over every sample of the validation set, prints the best k report
+           and returns the ConfusionSweep"""
+
+        path = self.knn.database_dir + "/training/" + validation_set + ".csv"
+        stat = os.stat(path)                                                # a regenerated csv does not resume old counts
+        with open(path, 'r', newline='') as file:
+            validation = np.array([[float(val) for val in row] for row in csv.reader(file)], dtype=np.float64)
+
+        shards = range(0, len(validation), self.shard_size)
+        settings = {"validation_set": validation_set, "samples": len(validation), "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns, "training": self.knn.dataset.stamp(), "k_range": k_range,
+                    "weight": self.knn.weight, "shard_size": self.shard_size}
+        done = self.load_checkpoint(settings)
+        todo = [first for first in shards if first not in done]
+        if done:
+            print("...Resuming,", len(done), "of", len(shards), "shards already swept...")
+
+        if todo:
+            self.sweep(validation, todo, k_range, done, settings)
+
+        empty = np.zeros(k_range, dtype=np.int64)
+        sweep = sum(done.values(), ConfusionSweep(empty, empty, empty, empty, (self.knn.weight,)))     # merge the shards
+        self.knn.calculate_performance(sweep)
+        return sweep
+
+
+    def sweep(self, validation, todo, k_range, done, settings):
+        """runs the shards starting at todo in the pool, adding their counts to done as they finish"""
+        features = self.knn.engine.features
+        labels = self.knn.engine.labels
+        features_block = shared_memory.SharedMemory(create=True, size=max(features.nbytes, 1))
+        labels_block = shared_memory.SharedMemory(create=True, size=max(labels.nbytes, 1))
+        try:
+            np.ndarray(features.shape, dtype=np.float32, buffer=features_block.buf)[:] = features
+            np.ndarray(labels.shape, dtype=np.int8, buffer=labels_block.buf)[:] = labels
+
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=attach,
+                                     initargs=(features_block.name, labels_block.name) + features.shape) as pool:
+                tasks = {pool.submit(sweep_shard, validation[first:first + self.shard_size], k_range, self.knn.weight): first
+                         for first in todo}
+                for task in as_completed(tasks):
+                    done[tasks[task]] = task.result()
+                    print("...Swept", len(done), "shards...")
+                    self.save_checkpoint(done, settings)
+        finally:
+            features_block.close()
+            features_block.unlink()
+            labels_block.close()
+            labels_block.unlink()
+
+
+    def load_checkpoint(self, settings):
+        """finished shards of an earlier run with the same settings, as {first sample: counts}"""
+        if self.checkpoint_path is None or not os.path.exists(self.checkpoint_path):
+            return {}
+        with np.load(self.checkpoint_path) as saved:
+            if json.loads(str(saved["settings"])) != settings:
+                return {}                                                   # a different sweep, start over
+            return {int(first): ConfusionSweep(*counts, (settings["weight"],)) for first, counts in zip(saved["firsts"], saved["counts"])}
+
+
+    def save_checkpoint(self, done, settings):
+        """writes the finished shards, replacing the last checkpoint"""
+        if self.checkpoint_path is None:
+            return
+        firsts = sorted(done)
+        with open(self.checkpoint_path + ".tmp", 'wb') as file:
+            np.savez(file, settings=np.array(json.dumps(settings)), firsts=np.array(firsts, dtype=np.int64),
+                     counts=np.array([[done[first].true_positives[0], done[first].true_negatives[0], done[first].false_positives[0],
+                                       done[first].false_negatives[0]] for first in firsts], dtype=np.int64).reshape(-1, 4, settings["k_range"]))
+        os.replace(self.checkpoint_path + ".tmp", self.checkpoint_path)
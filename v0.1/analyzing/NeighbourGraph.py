@@ -0,0 +1,103 @@
+#
+# Title: NeighbourGraph.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: k_max nearest neighbours of every training row (itself left out), saved next to the dataset
+# Example: graph = NeighbourGraph.load_or_build(database_dir + "/training/training_" + dataset_name + ".graph.npz", engine, 400)
+#
+
+import os
+import numpy as np
+from KDTree import KDTree
+from ConfusionSweep import ConfusionSweep
+
+
+class NeighbourGraph:
+    version = 1                 # bump when the layout of the saved graph changes
+
+    def __init__(self, indices, distances, checksum):
+        """indices: (rows x k_max) int32 neighbours of every training row, nearest first
+           distances: (rows x k_max) float32 distances to them
+           checksum: KDTree.fingerprint of the training stats the graph was built from"""
+        self.indices = indices
+        self.distances = distances
+        self.checksum = checksum
+
+
+    @property
+    def k_max(self):
+        return self.indices.shape[1]
+
+
+    @classmethod
+    def build(cls, engine, k_max, memory_budget=None):
+        """finds the k_max nearest other rows of every training row of engine, with batched searches"""
+        k_max = min(k_max, len(engine) - 1)
+        indices = np.empty((len(engine), k_max), dtype=np.int32)
+        distances = np.empty((len(engine), k_max), dtype=np.float32)
+
+        step = engine.chunk_size(memory_budget)
+        for first in range(0, len(engine), step):
+            rows = np.arange(first, min(first + step, len(engine)))
+            nearest, dist = engine.batch_neighbours(engine.features[rows], k_max + 1, memory_budget, exact=True)
+
+            # leave every row out of its own neighbours, a row with more than k_max exact duplicates before it drops its last
+            own = nearest == rows[:, None]
+            own[~own.any(axis=1), -1] = True
+            indices[rows] = nearest[~own].reshape(len(rows), k_max)
+            distances[rows] = dist[~own].reshape(len(rows), k_max)
+
+        return cls(indices, distances, KDTree.fingerprint(engine.features))
+
+
+    def save(self, path):
+        """writes the graph to path (.npz), replacing any older graph"""
+        with open(path + ".tmp", 'wb') as file:
+            np.savez(file, version=self.version, checksum=self.checksum, indices=self.indices, distances=self.distances)
+        os.replace(path + ".tmp", path)
+
+
+    @classmethod
+    def load(cls, path, engine, k_max):
+        """reads a graph written by save, returns None if it is missing, too short or was built from other rows"""
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as saved:
+            if int(saved["version"]) != cls.version or saved["indices"].shape[1] < min(k_max, len(engine) - 1):
+                return None
+            if str(saved["checksum"]) != KDTree.fingerprint(engine.features):
+                return None
+            return cls(saved["indices"][:, :k_max], saved["distances"][:, :k_max], str(saved["checksum"]))
+
+
+    @classmethod
+    def load_or_build(cls, path, engine, k_max):
+        """loads the graph at path, or builds it and saves it there if it is missing or out of date"""
+        graph = cls.load(path, engine, k_max)
+        if graph is None:
+            graph = cls.build(engine, k_max)
+            graph.save(path)
+        return graph
+
+
+    def confusion(self, labels, weights):
+        """leave-one-out TP, TN, FP, FN of every (weight, k) pair, as a ConfusionSweep.
+           A row is guessed healthy by its k nearest others when weight * healthy votes > unhealthy votes"""
+        healthy = labels == 1
+        counts = np.zeros((4, len(weights), self.k_max), dtype=np.int64)
+
+        for first in range(0, len(self.indices), 8192):                    # bounds the (rows x k_max) vote arrays
+            indices = self.indices[first:first + 8192]
+            healthy_votes = np.cumsum(healthy[indices], axis=1, dtype=np.int32)        # column k-1: votes of the k nearest
+            unhealthy_votes = np.arange(1, self.k_max + 1, dtype=np.int32) - healthy_votes
+            truth = healthy[first:first + 8192, None]
+
+            for w, weight in enumerate(weights):
+                guessed_healthy = weight * healthy_votes > unhealthy_votes
+                counts[0, w] += (~guessed_healthy & ~truth).sum(axis=0)     # guessed unhealthy, was unhealthy
+                counts[1, w] += (guessed_healthy & truth).sum(axis=0)       # guessed healthy, was healthy
+                counts[2, w] += (~guessed_healthy & truth).sum(axis=0)      # guessed unhealthy, was healthy
+                counts[3, w] += (guessed_healthy & ~truth).sum(axis=0)      # guessed healthy, was unhealthy
+
+        true_positives, true_negatives, false_positives, false_negatives = counts
+        return ConfusionSweep(true_positives, true_negatives, false_positives, false_negatives, weights)
@@ -0,0 +1,127 @@
+#
+# Title: QuantizedEngine.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: KNNEngine over stats stored in float16 or int8 codes, distances summed in blocks with wider accumulators
+# Example: indices, distances = QuantizedEngine(features, labels, "int8").neighbours(test_sample[2:], 173)
+#
+
+import numpy as np
+from KNNEngine import KNNEngine
+
+
+class QuantizedEngine(KNNEngine):
+    # storage type of the stats and type distances are summed in, int8 codes are differences of integers
+    precisions = {"float64": (np.float64, np.float64), "float32": (np.float32, np.float32),
+                  "float16": (np.float16, np.float32), "int8": (np.uint8, np.int32)}
+    levels = 255                # int8 codes per stat, over the [0, 1] range normalize_sample scales stats to
+    block_rows = 65536          # training rows widened at a time
+
+    def __init__(self, features, labels, precision="float16"):
+        """features: (rows x stats) matrix of normalized stats, labels: 1 for healthy rows, 0 for unhealthy
+           precision: "float64", "float32", "float16" or "int8", how the stats are kept in memory"""
+        self.precision = precision
+        self.storage, self.accumulator = self.precisions[precision]
+        self.codes = self.encode(features)
+        self.labels = np.ascontiguousarray(labels, dtype=np.int8)
+        self.norms = np.concatenate([np.einsum('ij,ij->i', block, block) for block in self.blocks()] or [np.empty(0)])
+        self.norms = self.norms.astype(np.float32)                          # squared length of every (decoded) row
+        self.index = None
+        self.approximate = None
+        self.nprobe = 8
+        self.decoded = None                                                 # float32 copy of the stats, once asked for
+
+
+    @property
+    def features(self):
+        """the stats back as float32, only for building indexes over them: a full copy, decoded on first use and kept"""
+        if self.decoded is None:
+            self.decoded = np.concatenate([block.astype(np.float32) for block in self.blocks()] or
+                                          [np.empty((0, self.codes.shape[1]), dtype=np.float32)])
+        return self.decoded
+
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes
+
+
+    def blocks(self, dtype=np.float64):
+        """the stats as dtype, block_rows rows at a time, never all decoded at once"""
+        for start in range(0, len(self.codes), self.block_rows):
+            yield self.decode(self.codes[start:start + self.block_rows]).astype(dtype, copy=False)
+
+
+    def use_index(self, path):
+        """a KDTree is built over a full float32 copy of the stats, which is what this engine avoids keeping"""
+        raise ValueError("KDTree search needs float32 stats, use KNNEngine or use_index=False")
+
+
+    def encode(self, features):
+        features = np.asarray(features, dtype=np.float64)
+        if self.precision == "int8":
+            return np.ascontiguousarray(np.rint(np.clip(features, 0, 1) * self.levels), dtype=np.uint8)
+        return np.ascontiguousarray(features, dtype=self.storage)
+
+
+    def decode(self, codes):
+        if self.precision == "int8":
+            return codes.astype(np.float64) / self.levels
+        return codes.astype(np.float64)
+
+
+    def squared_distances(self, query):
+        """squared euclidean distance from query (stats only) to every training row, a block of rows at a time"""
+        query = self.encode(np.asarray(query).reshape(1, -1))[0].astype(self.accumulator)
+        dist = np.empty(len(self.codes), dtype=self.accumulator)
+        for start in range(0, len(self.codes), self.block_rows):
+            diff = self.codes[start:start + self.block_rows].astype(self.accumulator)
+            diff -= query
+            dist[start:start + self.block_rows] = np.einsum('ij,ij->i', diff, diff)
+
+        if self.precision == "int8":                        # exact integer distances, back to stat units
+            return dist / np.float32(self.levels ** 2)
+        return dist
+
+
+    def exact_distances(self, codes, queries):
+        """squared distances between rows of codes and the encoded queries paired with them, the same values
+           squared_distances gives, summed in the accumulator type"""
+        diff = codes.astype(self.accumulator)
+        diff -= queries.astype(self.accumulator)
+        dist = np.einsum('ij,ij->i', diff, diff)
+        if self.precision == "int8":
+            return dist / np.float32(self.levels ** 2)
+        return dist
+
+
+    def scan_block(self, block, k):
+        """k nearest rows of every query of block out of all training rows. Candidates come from |a|^2 + |b|^2 - 2ab
+           in float32, one matrix product per block of decoded rows, and are then ranked by the exact distances of
+           the codes with the same tie order as neighbours"""
+        encoded = self.encode(block)
+        queries = self.decode(encoded).astype(np.float32)                   # the queries as neighbours sees them
+        query_norms = np.einsum('ij,ij->i', queries, queries)
+
+        dist = np.empty((len(block), len(self.codes)), dtype=np.float32)
+        for start, rows in zip(range(0, len(self.codes), self.block_rows), self.blocks(np.float32)):
+            part = dist[:, start:start + len(rows)]
+            np.matmul(queries, rows.T, out=part)
+            part *= -2
+        dist += self.norms
+        dist += query_norms[:, None]
+
+        # the expansion is only accurate to a few float32 steps of the norms, so keep every row that may be
+        # within reach of the kth distance and rank those exactly
+        kth = np.partition(dist, k - 1, axis=1)[:, k - 1]
+        reach = kth + 1e-5 * (query_norms + self.norms.max() + 1)
+        rows, cols = np.nonzero(dist <= reach[:, None])                     # by query, then by training row
+        del dist
+
+        exact = self.exact_distances(self.codes[cols], encoded[rows])
+        order = np.lexsort((cols, exact, rows))                             # by query, distance, then training row
+
+        counts = np.bincount(rows, minlength=len(block))
+        first = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        take = order[(first[:, None] + np.arange(k)).ravel()].reshape(len(block), k)
+        return cols[take], np.sqrt(exact[take])
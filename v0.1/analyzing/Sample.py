@@ -7,8 +7,11 @@
 #
 
 import numpy as np
+from FeatureEngine import FeatureEngine
 
 class Sample: 
+    engine = FeatureEngine()
+
     def __init__(self,
                  healthy: bool,
                  model: int, 
@@ -20,34 +23,33 @@ class Sample:
                  latency_max: list[int]):
         
         self.healthy = healthy
-        
+        self.model = self.model_id(model)
+
+        window = np.column_stack((temp_avg, temp_max, cpu_avg, cpu_max, latency_avg, latency_max))
+        self.features = self.engine.window_features(window)
+
+
+    @classmethod
+    def view(cls, healthy: bool, model, features):
+        """creates a sample over an already computed row of FeatureEngine stats, without copying it"""
+        sample = cls.__new__(cls)
+        sample.healthy = healthy
+        sample.model = cls.model_id(model)
+        sample.features = features
+        return sample
+
+
+    @staticmethod
+    def model_id(model):
         if (model == "anon_model_c"):
-            self.model = 0
+            return 0
         elif (model == "anon_model_j"):
-            self.model = 1
-
-        self.temp_avg = float(np.mean(temp_avg))
-        self.temp_avg_stdev = float(np.std(temp_avg))
-        self.temp_avg_slope = self.slope(temp_avg)
-        self.temp_max = float(np.max(temp_max))
-        self.temp_max_stdev = float(np.std(temp_max))
-        self.temp_max_slope = self.slope(temp_max)
-        self.cpu_avg = float(np.mean(cpu_avg))
-        self.cpu_avg_stdev = float(np.std(cpu_avg)) 
-        self.cpu_avg_slope = self.slope(cpu_avg)
-        self.cpu_max = float(np.max(cpu_max))
-        self.cpu_max_stdev = float(np.std(cpu_max))
-        self.cpu_max_slope = self.slope(cpu_max)
-        self.latency_avg = float(np.mean(latency_avg))
-        self.latency_avg_stdev = float(np.std(latency_avg))
-        self.latency_avg_slope = self.slope(latency_avg)
-        self.latency_max = float(np.max(latency_max))
-        self.latency_max_stdev = float(np.std(latency_max))
-        self.latency_max_slope = self.slope(latency_max)
+            return 1
+        return model
 
 
     def slope(self, nums: list[int]) -> int:
-        return (nums[-1] - nums[0]) / len(nums)
+        return float((nums[-1] - nums[0]) / len(nums))
 
 
     def to_dict(self):
@@ -91,3 +93,7 @@ class Sample:
                 f"latency_avg={self.latency_avg:.2f}, latency_avg_stdev={self.latency_avg_stdev:.2f}, latency_avg_slope={self.latency_avg_slope:.2f}, "
                 f"latency_max={self.latency_max:.2f}, latency_max_stdev={self.latency_max_stdev:.2f}, latency_max_slope={self.latency_max_slope:.2f})")
 
+
+# each stat (temp_avg, temp_avg_stdev, ...) reads its value from the features row
+for i, stat in enumerate(FeatureEngine.stats_full):
+    setattr(Sample, stat, property(lambda self, i=i: float(self.features[i])))
@@ -0,0 +1,102 @@
+#
+# Title: SampleStore.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: array-backed collection of samples, in place of lists of Sample objects
+# Example: store = SampleStore(); store.append(sample); first = store[0]
+#
+
+import numpy as np
+from Sample import Sample
+from FeatureEngine import FeatureEngine
+
+
+class SampleStore:
+    columns = ("features", "healthy", "models")
+
+    def __init__(self, capacity=1024):
+        """holds samples as rows of contiguous typed arrays, capacity rows allocated up front (grows as needed)"""
+        self.features = np.empty((capacity, len(FeatureEngine.stats_full)), dtype=np.float32)  # stats_full of every sample
+        self.healthy = np.empty(capacity, dtype=np.int8)            # label vector, 1 if healthy
+        self.models = np.empty(capacity, dtype=np.int8)             # model ids, see Sample.model_id
+        self.size = 0
+
+
+    def __len__(self):
+        return self.size
+
+
+    def __getitem__(self, index):
+        """a Sample reading from row index, or a SampleStore sharing the rows of a slice (a view, no copy)"""
+        if isinstance(index, slice):
+            view = SampleStore.__new__(SampleStore)
+            for attr in self.columns:
+                setattr(view, attr, getattr(self, attr)[:self.size][index])
+            view.size = len(view.healthy)
+            return view
+
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("SampleStore index out of range")
+        return Sample.view(bool(self.healthy[index]), int(self.models[index]), self.features[index])
+
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self[i]
+
+
+    def reserve(self, count):
+        """makes sure there is room for count more rows, doubling the arrays when there is not"""
+        needed = self.size + count
+        capacity = len(self.healthy)
+        if needed <= capacity:
+            return
+
+        capacity = max(needed, capacity * 2, 16)
+        for attr in self.columns:
+            old = getattr(self, attr)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, attr, new)
+
+
+    def append(self, sample):
+        """copies a Sample into the next row"""
+        self.reserve(1)
+        self.features[self.size] = sample.features
+        self.healthy[self.size] = 1 if sample.healthy else 0
+        self.models[self.size] = sample.model
+        self.size += 1
+
+
+    def extend_from(self, other, rows=None):
+        """appends rows (slice, index array or boolean mask, all if None) of another store, in that order"""
+        if rows is None:
+            rows = slice(0, other.size)
+        healthy = other.healthy[:other.size][rows]
+        self.reserve(len(healthy))
+
+        block = slice(self.size, self.size + len(healthy))
+        self.features[block] = other.features[:other.size][rows]
+        self.healthy[block] = healthy
+        self.models[block] = other.models[:other.size][rows]
+        self.size += len(healthy)
+
+
+    def pop(self, index=-1):
+        """removes row index and returns it as a Sample that owns its data. The last row moves into its place,
+           so popping anything but the last row does not keep the order of the rows"""
+        if index < 0:
+            index += self.size
+        sample = self[index]
+        sample.features = sample.features.copy()
+
+        last = self.size - 1
+        if index != last:
+            for attr in self.columns:
+                array = getattr(self, attr)
+                array[index] = array[last]
+        self.size -= 1
+        return sample
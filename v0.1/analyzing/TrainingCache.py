@@ -0,0 +1,69 @@
+#
+# Title: TrainingCache.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: float32 copy of a csv dataset, memory-mapped on open and rebuilt when the csv changes
+# Example: training = TrainingCache(database_dir + "/training/training_" + dataset_name + ".csv")
+#
+
+import json
+import os
+import numpy as np
+
+
+class TrainingCache:
+    version = 1                 # bump when the layout of the cache files changes
+    columns = {"labels": np.int8, "models": np.int8, "features": np.float32}
+
+    def __init__(self, csv_path):
+        """opens the cache of a csv dataset (label, model, stats...), saved next to it, rebuilding it first if the
+           csv changed since it was made. features, labels and models are read-only memory-mapped arrays"""
+        self.csv_path = csv_path
+        stem = csv_path[:-len(".csv")] if csv_path.endswith(".csv") else csv_path
+        self.paths = {column: stem + "." + column + ".npy" for column in self.columns}
+        self.stamp_path = stem + ".cache.json"
+
+        if not self.is_current():
+            self.rebuild()
+
+        self.labels = np.load(self.paths["labels"], mmap_mode='r')
+        self.models = np.load(self.paths["models"], mmap_mode='r')
+        self.features = np.load(self.paths["features"], mmap_mode='r')
+
+
+    def __len__(self):
+        return len(self.labels)
+
+
+    def stamp(self):
+        """what the cache has to match: size and modification time of the csv"""
+        stat = os.stat(self.csv_path)
+        return {"version": self.version, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+    def is_current(self):
+        if not os.path.exists(self.stamp_path) or not all(os.path.exists(path) for path in self.paths.values()):
+            return False
+        with open(self.stamp_path) as file:
+            return json.load(file) == self.stamp()
+
+
+    def rebuild(self):
+        """parses the csv once and writes the cache, the stamp goes last so a half written cache is never used"""
+        stamp = self.stamp()
+        data = np.loadtxt(self.csv_path, delimiter=',', dtype=np.float64, ndmin=2)
+        arrays = {"labels": data[:, 0], "models": data[:, 1], "features": data[:, 2:]}
+
+        for column, dtype in self.columns.items():
+            with open(self.paths[column] + ".tmp", 'wb') as file:
+                np.save(file, np.ascontiguousarray(arrays[column], dtype=dtype))
+            os.replace(self.paths[column] + ".tmp", self.paths[column])
+
+        with open(self.stamp_path + ".tmp", 'w') as file:
+            json.dump(stamp, file)
+        os.replace(self.stamp_path + ".tmp", self.stamp_path)
+
+
+    def row(self, index):
+        """row index as a list in the csv layout (label, model, stats...)"""
+        return [float(self.labels[index]), float(self.models[index])] + self.features[index].tolist()
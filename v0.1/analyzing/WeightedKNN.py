@@ -7,38 +7,29 @@
 
 from math import sqrt
 import csv
+import os
+import numpy as np
+from KNNEngine import KNNEngine
+from TrainingCache import TrainingCache
+from ConfusionSweep import ConfusionSweep
 
 class WeightedKNN:
-    def __init__(self, database_dir, dataset_name):
+    def __init__(self, database_dir, dataset_name, use_index = False):
         self.database_dir = database_dir
         self.dataset_name = dataset_name
 
         self.weight = 1
         self.dataset = self.file_to_dataset()
+        self.engine = KNNEngine(self.dataset.features, self.dataset.labels)     # neighbour search over the mapped stats
+        if use_index:                                       # opt-in KDTree (no faster than the blocked scan below ~100k
+                                                            # rows), saved next to the dataset, built on first use
+            self.engine.use_index(self.database_dir + "/training/training_" + self.dataset_name + ".kdtree.npz")
 
-    def file_to_dataset(self) -> list:
-        """read from csv file and return this data as a list"""
+    def file_to_dataset(self) -> TrainingCache:
+        """opens the training csv through its float32 cache, rebuilt only when the csv has changed"""
 
         path = self.database_dir + "/training/training_" + self.dataset_name + ".csv"
-        dataset = []
-        healthy_count = 0
-        unhealthy_count = 0
-
-        with open(path, 'r', newline='') as file:
-            reader = csv.reader(file)
-
-            for row in reader:
-
-                sample = [float(val) for val in row]
-
-                if sample[0] == 1:
-                    healthy_count += 1
-                else:
-                    unhealthy_count += 1
-
-                dataset.append(sample)
-
-        return dataset 
+        return TrainingCache(path)
     
     def distance(self, sample1, sample2):
         """calculates and returns euclidean distance between sample1 and sample 2"""
@@ -54,18 +45,8 @@ class WeightedKNN:
     def get_nn(self, test_sample, k):
         """gets and returna list of k nearest neighbours and their distances to the test sample"""
 
-        # get all neighbours
-        distances = list()
-        for train_sample in self.dataset:
-            dist = self.distance(test_sample, train_sample)
-            distances.append((train_sample, dist))
-            distances.sort(key=lambda tup: tup[1])
-            nn = list()
-            
-        for i in range(k):
-            nn.append(distances[i])                         # nn is as list of tuples (neighbour, distance)
-
-        return nn 
+        nearest, distances = self.engine.neighbours(test_sample[2:], k)
+        return [(self.dataset.row(i), float(dist)) for i, dist in zip(nearest, distances)]     # nn is as list of tuples (neighbour, distance)
     
     def predict(self, test_sample, k):
         """performs weighted knn algorigthm with k value on test_sample and 
@@ -94,7 +75,26 @@ class WeightedKNN:
             return 0
         
 
-    def pick_k(self, start, end, validation_set):
+    def predict_batch(self, samples, k, memory_budget=None):
+        """performs weighted knn algorithm with k value on every row of samples (same layout as test_sample) at once,
+        returns arrays of predictions (1 healthy, 0 unhealthy), healthy votes and unhealthy votes (sums of 1/distance)"""
+
+        samples = np.asarray(samples, dtype=np.float64).reshape(len(samples), -1)
+        nearest, distances = self.engine.batch_neighbours(samples[:, 2:], k, memory_budget)
+
+        distances = distances.astype(np.float64)
+        distances[distances == 0] = 1                       # same as predict, a neighbour at distance 0 counts as 1
+        healthy = self.engine.labels[nearest] == 1
+        healthy_votes = np.where(healthy, 1 / distances, 0).sum(axis=1)
+        unhealthy_votes = np.where(healthy, 0, 1 / distances).sum(axis=1)
+        predictions = (healthy_votes > unhealthy_votes).astype(np.int8)
+
+        return predictions, healthy_votes, unhealthy_votes
+
+
+    def pick_k(self, start, end, validation_set, k_range=300):
+        """sweeps k from 1 to k_range over samples start to end (1-based, inclusive) of the validation set, adds the
+           counts to earlier runs in sweep_path() and prints the k with the most correct guesses. Returns the ConfusionSweep"""
         path = self.database_dir + "/training/" + validation_set + ".csv"
         validation = []
         start = start-1
@@ -105,108 +105,40 @@ class WeightedKNN:
             for row in reader:
                 sample = [float(val) for val in row]
                 validation.append(sample)
-                
-        correct_counts = [0]*300
-
-        for i, sample in enumerate(validation):
 
-            if (i < start):
-                i += 1
-                continue
+        samples = np.asarray(validation[start:end + 1], dtype=np.float64).reshape(-1, self.engine.features.shape[1] + 2)
+        counts = np.zeros((4, k_range), dtype=np.int64)
 
-            if (i > end):
-                break
+        # get k_range nearest neighbors of every sample and see who wins at different thresholds, all at once
+        nearest, distances = self.engine.batch_neighbours(samples[:, 2:], k_range)
+        healthy_freq, unhealthy_freq = self.engine.vote_sweep(nearest, distances)
 
-            print("...Comparing k options on sample", (i + 1), "...")
+        guessed_healthy = healthy_freq > unhealthy_freq                 # (samples x k), k value guessed healthy
+        healthy = (samples[:, 0] == 1)[:, None]
+        width = guessed_healthy.shape[1]
+        counts[0, :width] = (~guessed_healthy & ~healthy).sum(axis=0)   # guessed unhealthy, was unhealthy
+        counts[1, :width] = (guessed_healthy & healthy).sum(axis=0)     # guessed healthy, was healthy
+        counts[2, :width] = (~guessed_healthy & healthy).sum(axis=0)    # guessed unhealthy, was healthy
+        counts[3, :width] = (guessed_healthy & ~healthy).sum(axis=0)    # guessed healthy, was unhealthy
 
-            false_positives = 0
-            false_negatives = 0
+        false_negatives = (guessed_healthy & ~healthy).sum(axis=1)      # per sample, over all k
+        false_positives = (~guessed_healthy & healthy).sum(axis=1)
 
-            # get 300 nearest neighbors
-            nn = self.get_nn(sample, 300)
+        for i in range(len(samples)):
+            print("...Comparing k options on sample", (start + i + 1), "...")
+            print("False positive count: ", false_positives[i], "False negative count: ", false_negatives[i])
 
-            # gather their votes
-            nn_distances = [0]*300
+        sweep = ConfusionSweep(*counts)
+        path = self.sweep_path()
+        if os.path.exists(path):                                        # add to the samples of earlier runs
+            sweep = ConfusionSweep.load(path) + sweep
+        sweep.save(path)
 
-            for index, n_sample in enumerate(nn):
-                vote = n_sample[0][0]
-                dist = n_sample[1]
-                nn_distances[index] = (vote, dist)
-
-
-            # see who wins at different thresholds
-            for k in range(0, 300):
-
-                healthy_freq = 0
-                unhealthy_freq = 0
-
-                j = 0
-                while j < (k + 1):
-                    vote = nn_distances[j][0]
-                    if (nn_distances[j][1] == 0):
-                        dist = 1
-                    else:
-                        dist = nn_distances[j][1] 
-
-                    if vote == 1:
-                        healthy_freq += (1 / dist)
-                    else:
-                        unhealthy_freq += (1 / dist)
-                    j += 1
-
-                if healthy_freq > unhealthy_freq:     # k value guessed healthy
-                    if sample[0] == 1:
-                        correct_counts[k] += 1
-                        #print("Correct healthy at k = ", k + 1, " for sample ", i)
-                    else:
-                        #print("False negative at k = ", k + 1, " for sample ", i)
-                        false_negatives += 1
-                        pass
-                else:                               # k value guessed unhealthy
-                    if sample[0] == 0:
-                        correct_counts[k] += 1
-                        #print("Correct unhealthy at k = ", k + 1, " for sample ", i)
-                    else:
-                        #print("False positive at k = ", k + 1, " for sample ", i)
-                        false_positives += 1
-                        pass
-            i += 1
-            print("False positive count: ", false_positives, "False negative count: ", false_negatives)
-
-        filename = "k_correct_counts_weighted.csv"
-    
-        with open(filename, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow([f"Samples {start+1}-{end+1} Inclusive"] + correct_counts)
-
-        return
-    
-
-    def read_k_file(self, start, end):
-        """read from the csv file to determine which k has the highest correct count"""
-        start = start-1
-        end = end-1
-
-        totals = [0]*300
-
-        with open('k_correct_counts_weighted.csv', 'r') as file:
-            reader = csv.reader(file)
+        best_k, best_accuracy = sweep.best_k("accuracy")
+        print("Best k value was ", best_k, " with ", round(best_accuracy * sweep.samples), " correct.")
 
-            for i, row in enumerate(reader):
-                if i < start:
-                    continue
-                if i > end:
-                    break
+        return sweep
 
-                values = list(map(int, row[1:]))
 
-                for i, value in enumerate(values):
-                    totals[i] += value
-        
-        most_correct = max(totals)
-        best_k = totals.index(most_correct) + 1
-
-        print("Best k value was ", best_k, " with ", most_correct, " correct.")
-
-        return
-    
+    def sweep_path(self):
+        return "k_testing/k_results_weighted.npz"
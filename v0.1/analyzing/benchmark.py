@@ -0,0 +1,62 @@
+#
+# Title: benchmark.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: timings of the KNN neighbour search options on our training and validation sets
+# Example: python3 benchmark.py
+#
+
+import csv
+import time
+import numpy as np
+from KNNEngine import KNNEngine
+from KDTree import KDTree
+
+
+database_dir = "/anonymized/file/path"
+dataset_name = "2023-1-1_2023-12-31"
+k = 173
+sizes = [10000, 30000, 100000, 300000, 1000000]
+query_count = 100
+
+
+def read_rows(path):
+    """reads one of our csv datasets as a list of float rows"""
+    with open(path, 'r', newline='') as file:
+        return [[float(val) for val in row] for row in csv.reader(file)]
+
+
+def time_queries(search, queries, k):
+    """runs search(query, k) for every query, returns the results and the mean milliseconds per query"""
+    start = time.perf_counter()
+    results = [search(query, k) for query in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def benchmark_index(training, queries, sizes, k):
+    """compares brute force search against the KDTree on the first rows of the training set"""
+    print(f"{'rows':>10} {'build s':>10} {'brute ms':>10} {'tree ms':>10} {'same':>6}")
+
+    for size in sizes:
+        if size > len(training):
+            continue
+        engine = KNNEngine(training.features[:size], training.labels[:size])
+
+        start = time.perf_counter()
+        tree = KDTree(engine.features)
+        build = time.perf_counter() - start
+
+        brute, brute_ms = time_queries(engine.neighbours, queries, k)
+        indexed, tree_ms = time_queries(tree.query, queries, k)
+        same = all(np.array_equal(a[0], b[0]) for a, b in zip(brute, indexed))
+
+        print(f"{size:>10} {build:>10.2f} {brute_ms:>10.2f} {tree_ms:>10.2f} {str(same):>6}")
+
+
+if __name__ == '__main__':
+    training = KNNEngine.from_rows(read_rows(database_dir + "/training/training_" + dataset_name + ".csv"))
+    validation = KNNEngine.from_rows(read_rows(database_dir + "/training/validation_" + dataset_name + ".csv"))
+    queries = validation.features[:query_count]
+
+    print("KDTree against brute force, k =", k)
+    benchmark_index(training, queries, sorted(set(sizes + [len(training)])), k)
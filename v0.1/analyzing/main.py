@@ -7,6 +7,7 @@
 
 from Grabber import Grabber 
 from KNN import KNN
+from KSelection import KSelection
 
     
 database_dir = "/anonymized/file/path"
@@ -16,27 +17,45 @@ sample_len = 14
 k = 173
 weight = 3
 
-print("Grabbing samples...")
-grabber = Grabber(database_dir, sample_len)
 
-print("Writing to datasets...")
-grabber.samples_to_file(dataset_name)
+def main():
+    print("Grabbing samples...")
+    grabber = Grabber(database_dir, sample_len)
 
-print("===Datasets updated===\n")
-  
+    print("Writing to datasets...")
+    grabber.samples_to_file(dataset_name)
 
-print("Preparing KNN...")
-knn = KNN(database_dir, dataset_name, weight)
+    print("===Datasets updated===\n")
 
-# test_sample = [0,0,0.30119581464872963,0.18518518518518517,0.05747922437673131,0.1919191919191919,0.020954388509705366,0.005841760265224129]
-# result = knn.predict(test_sample, 289)
-# print("Is healthy", result)
 
-# print("Weight =", knn.weight, "Determining most-correct k values for samples in validation set...")
-# knn.pick_k(1, 500, k_range, 'validation_v0.1_2023-1-1_2023-12-31')   
+    print("Preparing KNN...")
+    knn = KNN(database_dir, dataset_name, weight)
 
-# print("Finding best k value from correct count file...")
-# knn.read_k_file(1, 5)
+    # test_sample = [0,0,0.30119581464872963,0.18518518518518517,0.05747922437673131,0.1919191919191919,0.020954388509705366,0.005841760265224129]
+    # result = knn.predict(test_sample, 289)
+    # print("Is healthy", result)
 
-print("Testing accuracy/precision/recall...")
-knn.test_quality(k)
+    # print("Weight =", knn.weight, "Determining most-correct k values for samples in validation set...")
+    # knn.pick_k(1, 500, k_range, 'validation_v0.1_2023-1-1_2023-12-31')   
+
+    # print("Weight =", knn.weight, "Sweeping k over the whole validation set on all cores...")
+    # KSelection(knn, checkpoint_path="k_testing/k_sweep_w" + str(weight) + ".npz").run('validation_v0.1_2023-1-1_2023-12-31', k_range)
+
+    # print("Comparing approximate neighbour search against exact search...")
+    # knn.measure_approximate('validation_v0.1_2023-1-1_2023-12-31', k)
+
+    # print("Leave-one-out scores of every k and weight on the training set...")
+    # knn.leave_one_out(k_range)
+
+    # print("Comparing float16 and int8 storage of the training stats against float64...")
+    # knn.precision_report('validation_v0.1_2023-1-1_2023-12-31', k)
+
+    # print("Finding best k values from the saved sweep...")
+    # knn.calculate_performance(knn.load_sweep())
+
+    print("Testing accuracy/precision/recall...")
+    knn.test_quality(k)
+
+
+if __name__ == '__main__':         # KSelection's worker processes import this module, they must not rerun it
+    main()
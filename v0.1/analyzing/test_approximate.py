@@ -0,0 +1,56 @@
+#
+# Title: test_approximate.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: batched KNN predictions with an IVF index against one approximate query at a time
+# Example: cd v0.1/analyzing && python -m pytest test_approximate.py
+#
+
+import numpy as np
+import pytest
+from KNN import KNN
+from KNNEngine import KNNEngine
+
+
+K = 25
+NPROBE = 2
+
+
+@pytest.fixture
+def knn(tmp_path):
+    """KNN over 3000 random training rows (label, model, stats...), searching NPROBE lists per query"""
+    rng = np.random.default_rng(0)
+    rows = np.column_stack((rng.integers(0, 2, 3000), rng.integers(0, 2, 3000), rng.random((3000, 18))))
+    (tmp_path / "training").mkdir()
+    np.savetxt(tmp_path / "training" / "training_test.csv", rows, delimiter=",")
+    return KNN(str(tmp_path), "test", nprobe=NPROBE)
+
+
+@pytest.fixture
+def samples():
+    rng = np.random.default_rng(1)
+    return np.column_stack((rng.integers(0, 2, 200), rng.integers(0, 2, 200), rng.random((200, 18))))
+
+
+def test_predict_batch_uses_the_probed_lists_only(knn, samples, monkeypatch):
+    def full_scan(*args):
+        raise AssertionError("approximate batch search scanned every training row")
+    monkeypatch.setattr(knn.engine, "scan_block", full_scan)
+    monkeypatch.setattr(knn.engine, "scan", full_scan)
+
+    nearest, distances = knn.engine.batch_neighbours(samples[:, 2:], K)
+    predictions, healthy_votes, unhealthy_votes = knn.predict_batch(samples, K)
+
+    for i, sample in enumerate(samples):
+        expected, expected_distances = knn.engine.approximate.query(sample[2:], K, NPROBE)
+        np.testing.assert_array_equal(nearest[i], expected)
+        np.testing.assert_array_equal(distances[i], expected_distances)
+        assert predictions[i] == knn.predict(sample, K)
+    assert (healthy_votes + unhealthy_votes == K).all()
+
+
+def test_approximate_neighbours_differ_from_exact(knn, samples):
+    approximate, _ = knn.engine.batch_neighbours(samples[:, 2:], K)
+    exact, _ = KNNEngine(knn.engine.features, knn.engine.labels).batch_neighbours(samples[:, 2:], K)
+    assert not np.array_equal(approximate, exact)
+    np.testing.assert_array_equal(knn.engine.batch_neighbours(samples[:, 2:], K, exact=True)[0], exact)
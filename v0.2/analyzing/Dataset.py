@@ -0,0 +1,106 @@
+# Title: Dataset.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: v0.2 binary, memory-mappable training/validation datasets
+
+import json
+import os
+import numpy as np
+
+
+class Dataset:
+    # file layout: magic, header length (uint64), JSON header, then the column blocks at 64 byte aligned offsets
+    magic = b"PROACTDS"
+    align = 64
+    columns = {"features": np.float32, "failing": np.int8, "models": np.int8, "name_ids": np.int32}
+
+    def __init__(self, features, failing, models, name_ids, names, parameters, upper_limits=None, lower_limits=None):
+        '''Holds a dataset as column arrays, use Dataset.load or Dataset.from_dataframe to create one
+            Parameters: features : np.ndarray (rows x parameters) of float32 normalized stats
+                        failing : np.ndarray of int8 labels, 1 if failing
+                        models : np.ndarray of int8 model ids
+                        name_ids : np.ndarray of int32, index into names
+                        names : list of switch names
+                        parameters : list of str, the order of the feature columns
+                        upper_limits, lower_limits : dicts of normalization limits, if known'''
+        self.features = features
+        self.failing = failing
+        self.models = models
+        self.name_ids = name_ids
+        self.names = names
+        self.parameters = parameters
+        self.upper_limits = upper_limits
+        self.lower_limits = lower_limits
+
+
+    def __len__(self):
+        return len(self.failing)
+
+
+    @staticmethod
+    def write(path, features, failing, models, name_ids, names, parameters, upper_limits=None, lower_limits=None):
+        '''Writes a dataset to path in the binary format'''
+
+        arrays = {"features": features, "failing": failing, "models": models, "name_ids": name_ids}
+        arrays = {key: np.ascontiguousarray(arrays[key], dtype=dtype) for key, dtype in Dataset.columns.items()}
+
+        header = {"rows": len(failing), "parameters": list(parameters), "names": list(names),
+                  "upper_limits": upper_limits, "lower_limits": lower_limits, "blocks": {}}
+
+        # offsets depend on the header length, so lay out the blocks with a rough header size until it settles
+        header_len = 0
+        while True:
+            offset = Dataset.aligned(len(Dataset.magic) + 8 + header_len)
+            for key, array in arrays.items():
+                header["blocks"][key] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+                offset = Dataset.aligned(offset + array.nbytes)
+            encoded = json.dumps(header).encode()
+            if len(encoded) <= header_len:
+                break
+            header_len = len(encoded) + 256
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(Dataset.magic)
+            file.write(np.uint64(header_len).tobytes())
+            file.write(encoded.ljust(header_len))
+            for key, array in arrays.items():
+                file.seek(header["blocks"][key]["offset"])
+                file.write(array.tobytes())
+        os.replace(tmp_path, path)                                  # readers never see a half written file
+
+
+    @staticmethod
+    def aligned(offset):
+        return -(-offset // Dataset.align) * Dataset.align
+
+
+    @classmethod
+    def load(cls, path):
+        '''Opens a binary dataset, the columns are memory-mapped and read from disk as they are used
+            Parameters: path : str, path to the dataset file
+            Return:     Dataset'''
+
+        with open(path, 'rb') as file:
+            if file.read(len(cls.magic)) != cls.magic:
+                raise ValueError(f"{path} is not a dataset file")
+            header_len = int(np.frombuffer(file.read(8), dtype=np.uint64)[0])
+            header = json.loads(file.read(header_len))
+
+        blocks = {}
+        for key, block in header["blocks"].items():
+            if block["shape"][0] == 0:
+                blocks[key] = np.empty(block["shape"], dtype=block["dtype"])
+            else:                                                   # copy-on-write, so torch.from_numpy gets a writable array
+                blocks[key] = np.memmap(path, dtype=block["dtype"], mode='c', offset=block["offset"], shape=tuple(block["shape"]))
+
+        return cls(blocks["features"], blocks["failing"], blocks["models"], blocks["name_ids"], header["names"],
+                   header["parameters"], header["upper_limits"], header["lower_limits"])
+
+
+    @classmethod
+    def from_dataframe(cls, df, parameters):
+        '''Builds a dataset from a dataframe read from one of our csv files'''
+        names, name_ids = np.unique(df['name'].astype(str).values, return_inverse=True)
+        return cls(df[parameters].values.astype(np.float32), df['failing'].values.astype(np.int8),
+                   df['model'].values.astype(np.int8), name_ids.astype(np.int32), list(names), parameters)
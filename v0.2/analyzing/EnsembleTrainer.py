@@ -0,0 +1,117 @@
+# Title: EnsembleTrainer.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: v0.2 trains the models of an ensemble at the same time, one process per model, over shared datasets
+
+import io
+import os
+import contextlib
+import multiprocessing
+import numpy as np
+import torch
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from Dataset import Dataset
+from NeuralNetwork import NeuralNetwork
+from Trainer import Trainer
+
+
+trainer = None          # each worker's Trainer over the shared datasets, set by attach
+blocks = None           # the shared memory blocks under them, kept open for the life of the worker
+
+
+def attach(path, specs, parameters, threads):
+    '''Worker initializer, wraps the shared training and validation arrays in a Trainer without copying them
+        Parameters: path : str, database directory given to Trainer
+                    specs : dict {"train"/"val": {"features"/"failing": (block name, shape, dtype)}}
+                    parameters : list of str, the order of the feature columns
+                    threads : int, torch threads of this worker'''
+    global trainer, blocks
+    torch.set_num_threads(threads)                  # workers x threads stays within the cores
+    blocks = []
+    datasets = {}
+    for name, columns in specs.items():
+        arrays = {}
+        for column, (block_name, shape, dtype) in columns.items():
+            block = shared_memory.SharedMemory(name=block_name)
+            blocks.append(block)
+            arrays[column] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        datasets[name] = Dataset(arrays["features"], arrays["failing"], None, None, [], parameters)
+    trainer = Trainer(path, datasets["train"], datasets["val"])
+
+
+def train_member(seed, epochs):
+    '''Trains one model of the ensemble, seeded so that the same seed gives the same model
+        Parameters: seed : int, torch seed of the model's initial weights and batch order
+                    epochs : int
+        Return:     state_dict of the model as numpy arrays, and what train_model printed'''
+    torch.manual_seed(seed)
+    model = trainer.create_model()
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):           # printed by the parent once the model is done, not interleaved
+        trainer.train_model(model, epochs)
+    return {key: value.cpu().numpy() for key, value in model.state_dict().items()}, log.getvalue()
+
+
+class EnsembleTrainer:
+    columns = {"features": np.float32, "failing": np.int8}     # all that Trainer.train_model reads
+
+    def __init__(self, path, workers=None, threads=None):
+        '''Loads the datasets once, workers read them from shared memory
+            Parameters: path : str, database directory, as given to Trainer
+                        workers : int, number of processes (all cores if None)
+                        threads : int, torch threads per process (cores / workers if None)'''
+        self.path = path
+        self.trainer = Trainer(path)
+        self.workers = workers or os.cpu_count()
+        self.threads = threads
+
+
+    def train(self, count, epochs, ensemble_dir, seed=0):
+        '''Trains count models with seeds seed ... seed + count - 1 and saves them as model1.pt ... model<count>.pt
+            in ensemble_dir, the layout Tester.load_ensemble reads
+            Parameters: count : int, number of models
+                        epochs : int, epochs of each model
+                        ensemble_dir : str, directory the models are written to
+                        seed : int, seed of the first model
+            Return:     none'''
+        os.makedirs(ensemble_dir, exist_ok=True)
+        workers = min(self.workers, count)
+        threads = self.threads or max(1, os.cpu_count() // workers)
+
+        shared = []
+        try:
+            specs = {"train": self.share(self.trainer.train_data, shared), "val": self.share(self.trainer.val_data, shared)}
+
+            # spawned, not forked, so no worker inherits the parent's torch threads or CUDA state
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=attach,
+                                     initargs=(self.path, specs, self.trainer.parameters, threads)) as pool:
+                tasks = {pool.submit(train_member, seed + i, epochs): i for i in range(count)}
+                for task in as_completed(tasks):
+                    i = tasks[task]
+                    state, log = task.result()
+                    print(f"========== MODEL {i + 1} (seed {seed + i}) ==========")
+                    print(log, end='')
+
+                    model = NeuralNetwork()
+                    model.load_state_dict({key: torch.from_numpy(value) for key, value in state.items()})
+                    self.trainer.save_model(model, os.path.join(ensemble_dir, f"model{i + 1}.pt"))
+        finally:
+            for block in shared:
+                block.close()
+                block.unlink()
+
+
+    def share(self, dataset, shared):
+        '''Copies the columns train_model reads into new shared memory blocks, appended to shared
+            Parameters: dataset : Dataset
+                        shared : list of the SharedMemory blocks made so far
+            Return:     dict {column: (block name, shape, dtype)} for attach'''
+        spec = {}
+        for column, dtype in self.columns.items():
+            array = getattr(dataset, column)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            shared.append(block)
+            np.ndarray(array.shape, dtype=dtype, buffer=block.buf)[:] = array
+            spec[column] = (block.name, array.shape, np.dtype(dtype).str)
+        return spec
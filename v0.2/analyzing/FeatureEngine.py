@@ -0,0 +1,53 @@
+# Title: FeatureEngine.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: v0.2 batched window statistics for all samples of a switch
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class FeatureEngine:
+    stats = ["temp_avg", "temp_max", "cpu_avg", "cpu_max", "latency_avg", "latency_max"]
+
+    stats_full = ["temp_avg", "temp_avg_stdev", "temp_avg_slope",
+                  "temp_max", "temp_max_stdev", "temp_max_slope",
+                  "cpu_avg", "cpu_avg_stdev", "cpu_avg_slope",
+                  "cpu_max", "cpu_max_stdev", "cpu_max_slope",
+                  "latency_avg", "latency_avg_stdev", "latency_avg_slope",
+                  "latency_max", "latency_max_stdev", "latency_max_slope"]
+
+    # _avg stats are summarized by their mean over the window, _max stats by their max
+    use_max = np.array([stat.endswith("_max") for stat in stats])
+
+    def extract(self, series, end_days, sample_len):
+        '''Computes the stats_full features of every window ending on end_days in one pass
+            Parameters: series : SwitchSeries object
+                        end_days : array of int, days the windows end on (exclusive), all complete
+                        sample_len : int, number of days in a sample
+            Return:     features : np.ndarray of shape (len(end_days), 18), columns in stats_full order'''
+
+        end_days = np.asarray(end_days, dtype=np.int64)
+        if len(end_days) == 0:
+            return np.empty((0, len(self.stats_full)), dtype=np.float64)
+
+        # (days - sample_len + 1, stats, sample_len) view, no data is copied until we pick the windows
+        windows = sliding_window_view(series.values, sample_len, axis=0)[end_days - sample_len]
+        return self.summarize(windows)
+
+
+    def window_features(self, window):
+        '''Computes the stats_full features of a single (sample_len x stats) window'''
+        return self.summarize(np.asarray(window, dtype=np.float64).T[np.newaxis])[0]
+
+
+    def summarize(self, windows):
+        '''Reduces (samples, stats, sample_len) windows to a (samples, 18) feature matrix'''
+
+        sample_len = windows.shape[-1]
+        level = np.where(self.use_max, windows.max(axis=-1), windows.mean(axis=-1))
+        stdev = windows.std(axis=-1)
+        slope = (windows[..., -1] - windows[..., 0]) / sample_len
+
+        # interleave as (stat, stat_stdev, stat_slope) for each stat
+        return np.stack((level, stdev, slope), axis=-1).reshape(len(windows), len(self.stats_full))
@@ -0,0 +1,76 @@
+# Title: GrabCache.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: v0.2 per-shard cache of grabbed (unnormalized) samples
+
+import hashlib
+import json
+import os
+import numpy as np
+from SampleStore import SampleStore
+
+
+class GrabCache:
+    version = 1                                     # bump when ShardGrabber changes what it extracts
+
+    def __init__(self, database_dir):
+        '''Keeps the samples of every formatted shard in database_dir/cache, one file per shard'''
+        self.formatted_dir = database_dir + "/formatted/"
+        self.cache_dir = database_dir + "/cache/"
+
+
+    def key(self, file, sample_len, data_len, skip):
+        '''Hashes the shard content together with everything that decides which samples it gives'''
+        digest = hashlib.sha256()
+        with open(self.formatted_dir + file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        params = {"version": self.version, "sample_len": sample_len, "data_len": data_len, "skip": list(skip)}
+        digest.update(json.dumps(params, sort_keys=True).encode())
+        return digest.hexdigest()
+
+
+    def load(self, shard, key):
+        '''Fills shard from the cache if the cached entry has the same key
+            Parameters: shard : ShardGrabber with file set
+                        key : str, from GrabCache.key
+            Return:     boolean, True if the shard was found'''
+        path = self.cache_dir + shard.file + ".npz"
+        if not os.path.exists(path):
+            return False
+
+        with np.load(path) as cached:
+            meta = json.loads(str(cached["meta"]))
+            if meta["key"] != key:
+                return False
+
+            shard.samples = SampleStore.from_arrays(cached["features"], cached["failing"], cached["models"],
+                                                    cached["name_ids"], meta["names"])
+            shard.days = cached["days"]
+            shard.site_ids = cached["site_ids"]
+            shard.sites = meta["sites"]
+            shard.healthy_count = meta["healthy_count"]
+            shard.failing_count = meta["failing_count"]
+            if meta["has_limits"]:
+                shard.upper_limits = cached["upper_limits"]
+                shard.lower_limits = cached["lower_limits"]
+        return True
+
+
+    def save(self, shard, key):
+        '''Writes a grabbed shard to the cache, replacing any older entry of that shard'''
+        os.makedirs(self.cache_dir, exist_ok=True)
+        samples = shard.samples
+        size = len(samples)
+        meta = {"key": key, "names": samples.names, "sites": shard.sites, "healthy_count": shard.healthy_count,
+                "failing_count": shard.failing_count, "has_limits": shard.upper_limits is not None}
+        limits = {}
+        if shard.upper_limits is not None:
+            limits = {"upper_limits": shard.upper_limits, "lower_limits": shard.lower_limits}
+
+        path = self.cache_dir + shard.file + ".npz"
+        with open(path + ".tmp", 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), features=samples.features[:size], failing=samples.failing[:size],
+                     models=samples.models[:size], name_ids=samples.name_ids[:size], days=shard.days,
+                     site_ids=shard.site_ids, **limits)
+        os.replace(path + ".tmp", path)                 # an interrupted grab never leaves a broken entry
@@ -0,0 +1,43 @@
+# Title: MetricAccumulator.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: v0.2 loss sum and TP/FP/FN/TN counts kept as tensors on the device, read back once per epoch
+
+import torch
+
+
+class MetricAccumulator:
+    def __init__(self, device, members=None):
+        '''Starts all sums at zero on device, nothing is copied to the CPU until results() is called
+            Parameters: device : str or torch.device, where the model's outputs are
+                        members : int, number of models summed separately (StackedEnsemble), one model if None'''
+        shape = () if members is None else (members,)
+        self.loss_sum = torch.zeros(shape, dtype=torch.float64, device=device)     # float64, like summing loss.item()
+        self.counts = torch.zeros(shape + (4,), dtype=torch.int64, device=device)
+
+
+    def add_loss(self, loss):
+        '''Adds the loss tensor of one batch (of one model, for ensembles), one loss per model if members was given'''
+        self.loss_sum += loss.detach()
+
+
+    def add(self, loss, predicted, actual):
+        '''Adds one batch
+            Parameters: loss : torch.Tensor, loss of the batch (None to count predictions only)
+                        predicted : torch.Tensor, 1 where the sample is predicted failing, (members x ...) if members was given
+                        actual : torch.Tensor of the same shape, 1 where the sample is failing'''
+        if loss is not None:
+            self.add_loss(loss)
+        predicted = (predicted == 1).reshape(self.counts.shape[:-1] + (-1,))
+        actual = (actual == 1).reshape(predicted.shape)
+        self.counts += torch.stack(((predicted & actual).sum(-1), (predicted & ~actual).sum(-1),
+                                    (~predicted & actual).sum(-1), (~predicted & ~actual).sum(-1)), dim=-1)
+
+
+    def results(self):
+        '''Copies the sums to the CPU, the only synchronization of the epoch
+            Return:     total loss (float), and true positives, false positives, false negatives, true negatives (numpy int64),
+                        each a numpy array over the models if members was given'''
+        true_positive, false_positive, false_negative, true_negative = self.counts.cpu().numpy().T
+        loss = self.loss_sum.item() if self.loss_sum.dim() == 0 else self.loss_sum.cpu().numpy()
+        return loss, true_positive, false_positive, false_negative, true_negative
@@ -0,0 +1,67 @@
+# Title: Normalizer.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: v0.2 min/max normalization limits, shared by grabbing, training, testing and scoring
+
+import json
+import os
+import numpy as np
+
+
+class Normalizer:
+    def __init__(self, parameters, upper_limits=None, lower_limits=None):
+        '''Holds the top and bottom limit of every stat, used to scale stats to 0-1 range
+            Parameters: parameters : list of str, stats in the order of the feature columns
+                        upper_limits, lower_limits : dicts {stat: limit}, empty limits if None'''
+        self.parameters = list(parameters)
+        self.upper = np.full(len(self.parameters), -np.inf)
+        self.lower = np.full(len(self.parameters), np.inf)
+        if upper_limits is not None:
+            self.upper = np.array([upper_limits[stat] for stat in self.parameters], dtype=np.float64)
+            self.lower = np.array([lower_limits[stat] for stat in self.parameters], dtype=np.float64)
+
+
+    @property
+    def upper_limits(self):
+        return {stat: float(limit) for stat, limit in zip(self.parameters, self.upper)}
+
+
+    @property
+    def lower_limits(self):
+        return {stat: float(limit) for stat, limit in zip(self.parameters, self.lower)}
+
+
+    def update(self, features):
+        '''Widens the limits to cover a block of samples, in one reduction per limit
+            Parameters: features : np.ndarray, rows of stats in parameters order'''
+        if len(features):
+            self.merge(features.max(axis=0), features.min(axis=0))
+
+
+    def merge(self, upper, lower):
+        '''Widens the limits to cover another set of limits (e.g. found by a worker process)'''
+        np.maximum(self.upper, upper, out=self.upper)
+        np.minimum(self.lower, lower, out=self.lower)
+
+
+    def transform(self, features):
+        '''Scales stats to 0-1 range with the current limits
+            Parameters: features : np.ndarray, one sample or rows of samples, stats in parameters order
+            Return:     np.ndarray of float64'''
+        return (np.asarray(features, dtype=np.float64) - self.lower) / (self.upper - self.lower)
+
+
+    def save(self, path):
+        '''Writes the limits to a json file'''
+        limits = {"parameters": self.parameters, "upper_limits": self.upper_limits, "lower_limits": self.lower_limits}
+        with open(path + ".tmp", 'w') as file:
+            json.dump(limits, file, indent=4)
+        os.replace(path + ".tmp", path)
+
+
+    @classmethod
+    def load(cls, path):
+        '''Reads limits written by Normalizer.save'''
+        with open(path) as file:
+            limits = json.load(file)
+        return cls(limits["parameters"], limits["upper_limits"], limits["lower_limits"])
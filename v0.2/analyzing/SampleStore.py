@@ -0,0 +1,171 @@
+# Title: SampleStore.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: v0.2 array-backed collection of samples
+
+import numpy as np
+from Sample import Sample
+from FeatureEngine import FeatureEngine
+
+
+class SampleStore:
+    def __init__(self, capacity=1024):
+        '''Holds samples as rows of contiguous typed arrays instead of a list of Sample objects
+            Parameters: capacity : int, number of rows to allocate up front (grows as needed)'''
+
+        width = len(FeatureEngine.stats_full)
+        self.features = np.empty((capacity, width), dtype=np.float32)      # stats_full of every sample
+        self.failing = np.empty(capacity, dtype=np.int8)                    # label vector, 1 if failing
+        self.models = np.empty(capacity, dtype=np.int8)                     # model ids, see Sample.model_id
+        self.name_ids = np.empty(capacity, dtype=np.int32)                  # index into names
+
+        self.names = []                                                     # interned switch names
+        self.name_index = {}
+        self.size = 0
+
+
+    @classmethod
+    def from_arrays(cls, features, failing, models, name_ids, names):
+        '''Wraps existing column arrays (e.g. loaded from a file) in a store without copying them'''
+        store = cls.__new__(cls)
+        store.features = features
+        store.failing = failing
+        store.models = models
+        store.name_ids = name_ids
+        store.names = list(names)
+        store.name_index = {name: i for i, name in enumerate(store.names)}
+        store.size = len(failing)
+        return store
+
+
+    def __len__(self):
+        return self.size
+
+
+    def __getitem__(self, index):
+        '''Returns a Sample reading from row index, or a SampleStore sharing the rows of a slice
+            (a slice is a view, changes to its rows show up in this store too)'''
+
+        if isinstance(index, slice):
+            rows = index
+        else:
+            if index < 0:
+                index += self.size
+            if not 0 <= index < self.size:
+                raise IndexError("SampleStore index out of range")
+            return Sample.view(bool(self.failing[index]), self.names[self.name_ids[index]],
+                               int(self.models[index]), self.features[index])
+
+        view = SampleStore.__new__(SampleStore)                             # zero-copy, rows are shared with this store
+        view.features = self.features[:self.size][rows]
+        view.failing = self.failing[:self.size][rows]
+        view.models = self.models[:self.size][rows]
+        view.name_ids = self.name_ids[:self.size][rows]
+        view.names = self.names
+        view.name_index = self.name_index
+        view.size = len(view.failing)
+        return view
+
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self[i]
+
+
+    def intern(self, name):
+        '''Returns the id of name in the name table, adding it if it is new'''
+        name_id = self.name_index.get(name)
+        if name_id is None:
+            name_id = len(self.names)
+            self.names.append(name)
+            self.name_index[name] = name_id
+        return name_id
+
+
+    def reserve(self, count):
+        '''Makes sure there is room for count more rows, doubling the arrays when there is not'''
+        needed = self.size + count
+        capacity = len(self.failing)
+        if needed <= capacity:
+            return
+
+        capacity = max(needed, capacity * 2, 16)
+        for attr in ("features", "failing", "models", "name_ids"):
+            old = getattr(self, attr)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, attr, new)
+
+
+    def append(self, sample):
+        '''Copies a Sample into the next row'''
+        self.reserve(1)
+        i = self.size
+        self.features[i] = sample.features
+        self.failing[i] = 1 if sample.failing else 0
+        self.models[i] = sample.model
+        self.name_ids[i] = self.intern(sample.name)
+        self.size += 1
+
+
+    def extend(self, features, failing, model, name):
+        '''Appends a block of samples at once
+            Parameters: features : np.ndarray of shape (n, 18)
+                        failing : array of n booleans
+                        model : int, model id shared by all samples (or array of n ids)
+                        name : str, switch name shared by all samples (or list of n names)'''
+        count = len(features)
+        self.reserve(count)
+        rows = slice(self.size, self.size + count)
+        self.features[rows] = features
+        self.failing[rows] = failing
+        self.models[rows] = model
+        if isinstance(name, str) or name is None:
+            self.name_ids[rows] = self.intern(name)
+        else:
+            self.name_ids[rows] = [self.intern(n) for n in name]
+        self.size += count
+
+
+    def extend_from(self, other, rows=None):
+        '''Appends rows of another store, moving its names into this store's name table
+            Parameters: other : SampleStore
+                        rows : slice, index array or boolean mask into other (all rows if None)'''
+        if rows is None:
+            rows = slice(0, other.size)
+        remap = np.array([self.intern(name) for name in other.names], dtype=np.int32)
+        name_ids = other.name_ids[:other.size][rows]
+        count = len(name_ids)
+
+        self.reserve(count)
+        block = slice(self.size, self.size + count)
+        self.features[block] = other.features[:other.size][rows]
+        self.failing[block] = other.failing[:other.size][rows]
+        self.models[block] = other.models[:other.size][rows]
+        self.name_ids[block] = remap[name_ids] if len(remap) else name_ids
+        self.size += count
+
+
+    def __getstate__(self):
+        '''Only the filled rows are pickled, e.g. when a store is sent back from a worker process'''
+        state = dict(self.__dict__)
+        for attr in ("features", "failing", "models", "name_ids"):
+            state[attr] = state[attr][:self.size]
+        return state
+
+
+    def pop(self, index=-1):
+        '''Removes row index and returns it as a Sample that owns its data, in O(1): the last row moves into
+            its place, so popping anything but the last row does not keep the order of the rows'''
+        if index < 0:
+            index += self.size
+        sample = self[index]
+        sample.features = sample.features.copy()
+
+        last = self.size - 1
+        if index != last:
+            for attr in ("features", "failing", "models", "name_ids"):
+                array = getattr(self, attr)
+                array[index] = array[last]
+        self.size -= 1
+        return sample
@@ -0,0 +1,199 @@
+# Title: ShardGrabber.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: v0.2 grabs the samples of one formatted shard, independently of all other shards
+
+import numpy as np
+from Sample import Sample
+from SampleStore import SampleStore
+from SwitchSeries import SwitchSeries
+from FeatureEngine import FeatureEngine
+from ShardReader import ShardReader
+from GrabCache import GrabCache
+
+
+def grab_shard(database_dir, sample_len, file, use_cache=False):
+    '''Grabs all samples of one shard, used as is by Grabber and by its worker processes
+        Parameters: database_dir : str
+                    sample_len : int
+                    file : str, filename in database_dir/formatted
+                    use_cache : bool, reuse the samples from the last grab if the shard did not change
+        Return:     ShardGrabber holding the samples of that shard'''
+    shard = ShardGrabber(database_dir, sample_len)
+
+    if not use_cache:
+        shard.grab(file)
+        return shard
+
+    cache = GrabCache(database_dir)
+    key = cache.key(file, sample_len, shard.data_len, shard.skip)
+    shard.file = file
+    if not cache.load(shard, key):
+        shard.grab(file)
+        cache.save(shard, key)
+    return shard
+
+
+class ShardGrabber:
+    data_len = 579                                      # last day of observation
+    skip = []                                           # these periods will not be used as healthy or failing data
+                                                        # represents desired gap between down-events and healthy periods
+
+    def __init__(self, database_dir, sample_len):
+        self.database_dir = database_dir
+        self.sample_len = sample_len
+        self.file = None
+
+        self.samples = SampleStore()                    # every sample of the shard, in the order they were found
+        self.days = []                                  # day each sample ends on
+        self.site_ids = []                              # index into sites, for each sample
+        self.sites = []
+
+        self.healthy_count = 0
+        self.failing_count = 0
+
+        self.upper_limits = None                        # limits of the healthy samples, failing samples might still get dropped
+        self.lower_limits = None
+
+        self.engine = FeatureEngine()
+
+
+    def grab(self, file):
+        '''Reads a shard and keeps all of its valid samples, as compact arrays'''
+        self.file = file
+        database = self.file_to_db(file)
+        switches = self.grab_switches(database)
+        self.switches_to_samples(switches)
+
+        self.days = np.array(self.days, dtype=np.int32)
+        self.site_ids = np.array(self.site_ids, dtype=np.int32)
+
+        healthy = self.samples.features[:len(self.samples)][self.samples.failing[:len(self.samples)] == 0]
+        if len(healthy):
+            self.upper_limits = healthy.max(axis=0)
+            self.lower_limits = healthy.min(axis=0)
+        return
+
+
+    def file_to_db(self, file):
+        '''Streams the switches of a shard one at a time, so only one switch is held in memory
+            Parameters: file: string representing filename
+            Return:     database : ShardReader yielding (key, switch) pairs, unwanted switches are dropped while being read'''
+
+        formatted_dir = self.database_dir + "/formatted/"
+        path = formatted_dir + file
+
+        return ShardReader(path, self.is_unwanted)
+
+    def grab_switches(self, database):
+        '''Grabs only switches from database and throws away invalid switches
+            Parameters: database: iterable of (key, switch) pairs holding all info about switches
+            Return:     generator of valid switches only'''
+
+        for key, switch in database:
+            # if we don't have enough data points to form a single sample or it is juniper, we don't care about this switch
+            if switch["model"] == "juniper" or len(switch["ping_latency_max"]) < self.sample_len:
+                continue
+            yield switch
+
+    def is_unwanted(self, switch):
+        '''Checks if a (possibly partly read) switch can already be thrown away
+            Parameters: switch: dict holding the fields of the switch read so far
+            Return:     boolean'''
+
+        if "model" not in switch:                   # wait for it, grab_switches raises if the switch has none
+            return False
+        if switch["model"] == "juniper":
+            return True
+        return "ping_latency_max" in switch and len(switch["ping_latency_max"]) < self.sample_len
+
+    def switches_to_samples(self, switches):
+        '''Scans switches and grabs all valid samples for training
+            Parameters: switches: iterable of switch dicts
+            Return:     none'''
+
+        sample_len = self.sample_len
+        data_len = self.data_len
+        skip = self.skip
+
+        for switch in switches:
+            series = SwitchSeries(switch)                                   # dense arrays of this switch's stats, built once
+            sample_days = []                                                # end days and labels of this switch's samples
+            sample_failing = []
+            events = switch["events"]
+            event_days_raw = [int(x) for x in events.keys()]
+            event_days = [x for x in event_days_raw if x <= data_len]
+            event_days.sort()
+
+            if (len(event_days) == 0 or event_days[-1] != data_len):         # synthesize event at end of observation s.t. we check for
+                event_days.append(data_len)                                  # healthy data near end of year, even if event didn't happen
+
+            last_event_day = 0
+
+            # identify valid periods for this switch
+            for end_day in event_days:
+
+                dist_from_event = 0
+
+                if (end_day == data_len or events[str(end_day)][0] == "down"):      # if end of period is last day of observation, or any period ending in down event
+
+                    while ( (end_day - last_event_day) >= sample_len ):             # identify valid samples within this period
+
+                        if (dist_from_event not in skip):                           # to create desired gap between down events and healthy periods
+
+                            valid = self.is_valid_sample(series, end_day)
+
+                            if valid:                                   # if sample is valid, find out if it's going to fail or not before creation
+                                if (end_day == data_len):
+                                    if (str(end_day) in events.keys()): # if sample period is leading up to natural final event, failing
+                                        failing = True
+                                        self.failing_count += 1
+                                    else:                               # if leading up to synthetic final event, not failing
+                                        failing = False
+                                        self.healthy_count += 1
+                                elif (dist_from_event < 1):             # if leading up to an event, failing
+                                    failing = True
+                                    self.failing_count += 1
+                                else:                                   # otherwise, not failing
+                                    failing = False
+                                    self.healthy_count += 1
+
+                                sample_days.append(end_day)             # multiple failures at a site are dropped by Grabber.merge_shard
+                                sample_failing.append(failing)
+
+                        end_day = end_day - sample_len                  # ready to check next potential sample in this period
+                        dist_from_event += 1
+
+                last_event_day = end_day                                # all potential samples in period have been checked; end day is now start of next period
+
+            self.make_samples(series, sample_days, sample_failing)          # compute stats of all samples of this switch at once
+
+        return
+
+
+    def is_valid_sample(self, series, day) -> bool:
+        '''Check if this potential sample is valid by looking at preceding sample_len days
+            Parameters: series : SwitchSeries object
+                        day : int, day of observation start
+            Return:     valid : boolean, indicating if sample is valid or not'''
+
+        return series.is_complete(day, self.sample_len)                  # for sample to be valid, all stats must be present
+
+
+    def make_samples(self, series, days, failing):
+        '''Computes the stats of all samples of a switch at once and adds them to the shard
+            Parameters: series : SwitchSeries object
+                        days : list of int, days that the samples end on
+                        failing : list of booleans indicating if switch is going to fail or not
+            Return:   none'''
+
+        features = self.engine.extract(series, days, self.sample_len)                                  # one row of stats per sample
+
+        if series.site_code not in self.sites:
+            self.sites.append(series.site_code)
+        site_id = self.sites.index(series.site_code)
+
+        self.samples.extend(features, failing, Sample.model_id(series.model), series.name)
+        self.days.extend(days)
+        self.site_ids.extend([site_id] * len(days))
+        return
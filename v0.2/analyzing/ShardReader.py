@@ -0,0 +1,122 @@
+# Title: ShardReader.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: v0.2 reads a formatted shard one switch at a time
+
+import json
+import mmap
+import re
+
+
+class ShardReader:
+    space = re.compile(rb'[ \t\n\r]*')
+    string = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"')
+    scalar = re.compile(rb'[^,:\[\]{}\s]+')
+    filler = re.compile(rb'(?:[^\[\]{}"]+|"[^"\\]*(?:\\.[^"\\]*)*")*')      # everything up to the next bracket, strings included
+
+    def __init__(self, path, unwanted=None):
+        '''Iterates over the (key, switch) pairs of a shard without loading the whole file
+            Parameters: path : str, path to an alpha_switches_*.json shard
+                        unwanted : function(switch) -> bool, called on the partly read switch after each of its
+                                   fields, a switch is skipped as soon as it returns True'''
+        self.path = path
+        self.unwanted = unwanted
+
+
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:      # file pages, not a copy of the shard
+                yield from self.switches(buf)
+
+
+    def switches(self, buf):
+        '''Yields the switches the way json.load would hold them: a key given twice keeps its last value, in the
+            position of its first appearance. Only the byte offsets of the values are collected up front'''
+        offsets, pos = self.members(buf, self.skip(buf, 0))
+        pos = self.skip(buf, pos)
+        if pos != len(buf):
+            raise ValueError(f"{self.path}: extra data at byte {pos}")
+
+        for key, (start, end) in offsets.items():
+            switch = self.read_switch(buf, start, end)
+            if switch is not None:
+                yield key, switch
+                switch = None                                               # drop our reference before reading on
+
+
+    def members(self, buf, pos):
+        '''Scans the object starting at pos without decoding its values
+            Return:     dict of key -> (start, end) of its last value in buf, in order of first appearance,
+                        and the position after the object'''
+        offsets = {}
+        pos = self.skip(buf, self.expect(buf, pos, b'{'))
+        if buf[pos:pos + 1] == b'}':
+            return offsets, pos + 1
+
+        while True:
+            key, pos = self.read_string(buf, pos)
+            pos = self.skip(buf, self.expect(buf, self.skip(buf, pos), b':'))
+            end = self.value_end(buf, pos)
+            offsets[key] = (pos, end)                                       # a repeated key keeps its first place, like dict
+
+            pos = self.skip(buf, end)
+            if buf[pos:pos + 1] == b',':
+                pos = self.skip(buf, pos + 1)
+            else:
+                return offsets, self.expect(buf, pos, b'}')
+
+
+    def read_switch(self, buf, start, end):
+        '''Decodes one switch field by field, returns None as soon as it turns out to be unwanted'''
+
+        if buf[start:start + 1] != b'{':                                    # not an object, nothing to filter on
+            return json.loads(buf[start:end])
+
+        switch = {}
+        for key, (start, end) in self.members(buf, start)[0].items():
+            switch[key] = json.loads(buf[start:end])
+            if self.unwanted is not None and self.unwanted(switch):
+                return None                                                 # the rest is never decoded
+        return switch
+
+
+    def read_string(self, buf, pos):
+        match = self.string.match(buf, pos)
+        if match is None:
+            raise ValueError(f"{self.path}: expected a string at byte {pos}")
+        return json.loads(match.group()), match.end()
+
+
+    def value_end(self, buf, pos):
+        '''Returns the position just after the JSON value starting at pos'''
+        first = buf[pos:pos + 1]
+        if first in (b'{', b'['):
+            return self.close(buf, pos + 1, 1)
+        if first == b'"':
+            return self.read_string(buf, pos)[1]
+        match = self.scalar.match(buf, pos)
+        if match is None:
+            raise ValueError(f"{self.path}: expected a value at byte {pos}")
+        return match.end()
+
+
+    def close(self, buf, pos, depth):
+        '''Scans from pos until depth open brackets are closed, returns the position after the last one'''
+        while depth:
+            pos = self.filler.match(buf, pos).end()
+            char = buf[pos:pos + 1]
+            if not char:
+                raise ValueError(f"{self.path}: unexpected end of file")
+            depth += 1 if char in (b'{', b'[') else -1
+            pos += 1
+        return pos
+
+
+    def skip(self, buf, pos):
+        return self.space.match(buf, pos).end()
+
+
+    def expect(self, buf, pos, char):
+        if buf[pos:pos + 1] != char:
+            raise ValueError(f"{self.path}: expected {char.decode()} at byte {pos}")
+        return pos + 1
@@ -0,0 +1,54 @@
+# Title: Splitter.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: v0.2 seeded training/validation split over index arrays
+
+import math
+import numpy as np
+
+
+class Splitter:
+    def __init__(self, failing, seed=None):
+        '''Shuffles the failing and the healthy samples once, both sets are then cut from these orders
+            Parameters: failing : np.ndarray of booleans, label of every sample
+                        seed : int, the same seed always gives the same split (random if None)'''
+        failing = np.asarray(failing, dtype=bool)
+        rng = np.random.default_rng(seed)
+        self.failing_order = rng.permutation(np.flatnonzero(failing))
+        self.healthy_order = rng.permutation(np.flatnonzero(~failing))
+
+
+    def equal_set(self, share=0.9):
+        '''Indices of a training set with 50% healthy and 50% failing samples, alternating
+            Parameters: share : float, part of the failing samples that goes into training
+            Return:     np.ndarray of indices'''
+        pairs = math.ceil(len(self.failing_order) * share)
+        pairs = min(pairs, len(self.healthy_order))
+
+        training = np.empty(2 * pairs, dtype=np.int64)
+        training[0::2] = self.failing_order[:pairs]
+        training[1::2] = self.healthy_order[:pairs]
+        return training
+
+
+    def validation_set(self, healthy_ratio, share=0.9):
+        '''Indices of a validation set from the samples left over by equal_set, each failing sample
+            followed by healthy_ratio (rounded up) healthy samples, for as long as healthy samples last
+            Parameters: healthy_ratio : float, number of healthy samples per failing sample
+                        share : float, same as given to equal_set
+            Return:     np.ndarray of indices'''
+        pairs = min(math.ceil(len(self.failing_order) * share), len(self.healthy_order))
+        failing = self.failing_order[pairs:]
+        healthy = self.healthy_order[pairs:]
+
+        per_failing = math.ceil(healthy_ratio)
+        used = min(len(failing) * per_failing, len(healthy))
+
+        # failing sample i sits after its own i*per_failing healthy samples and the i failing ones before it
+        failing_pos = np.arange(len(failing)) + np.minimum(np.arange(len(failing)) * per_failing, used)
+        healthy_pos = np.arange(used) + np.arange(used) // max(per_failing, 1) + 1
+
+        validation = np.empty(len(failing) + used, dtype=np.int64)
+        validation[failing_pos] = failing
+        validation[healthy_pos] = healthy[:used]
+        return validation
@@ -0,0 +1,40 @@
+# Title: StackedAdam.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: v0.2 Adam over the stacked weights of a StackedEnsemble, with a learning rate per model
+
+import torch
+
+
+class StackedAdam:
+    def __init__(self, params, betas=(0.9, 0.999), eps=1e-8):
+        '''The update of optim.Adam (without weight decay or amsgrad), each model taking a step of its own size
+            Parameters: params : iterable of tensors whose first dimension is the model, e.g. StackedEnsemble.parameters()
+                        betas, eps : same as for optim.Adam'''
+        self.params = list(params)
+        self.beta1, self.beta2 = betas
+        self.eps = eps
+        self.steps = 0
+        self.exp_avg = [torch.zeros_like(p) for p in self.params]          # first and second moments, like Adam's state
+        self.exp_avg_sq = [torch.zeros_like(p) for p in self.params]
+
+
+    def zero_grad(self):
+        for p in self.params:
+            p.grad = None
+
+
+    @torch.no_grad()
+    def step(self, lr):
+        '''Updates every parameter from its gradient
+            Parameters: lr : torch.Tensor (models x 1 x 1), learning rate of every model, a model with 0 is left as it is'''
+        self.steps += 1
+        bias_correction1 = 1 - self.beta1 ** self.steps
+        bias_correction2_sqrt = (1 - self.beta2 ** self.steps) ** 0.5
+        step_size = lr / bias_correction1
+
+        for p, exp_avg, exp_avg_sq in zip(self.params, self.exp_avg, self.exp_avg_sq):
+            exp_avg.lerp_(p.grad, 1 - self.beta1)
+            exp_avg_sq.mul_(self.beta2).addcmul_(p.grad, p.grad, value=1 - self.beta2)
+            denom = (exp_avg_sq.sqrt() / bias_correction2_sqrt).add_(self.eps)
+            p.sub_(exp_avg / denom * step_size)
@@ -0,0 +1,67 @@
+# Title: StackedEnsemble.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: v0.2 the models of an ensemble as one module, weights stacked and every layer one batched matmul
+
+import torch
+import torch.nn as nn
+from NeuralNetwork import NeuralNetwork
+
+
+class StackedEnsemble(nn.Module):
+    layers = ["layer1", "layer2", "layer3", "output"]          # the nn.Linear layers of NeuralNetwork, in order
+
+    def __init__(self, count, seed=None):
+        '''Stacks count new NeuralNetworks
+            Parameters: count : int, number of models
+                        seed : int, model i starts from the weights NeuralNetwork() has after torch.manual_seed(seed + i),
+                               the same start EnsembleTrainer gives it (torch's current random state if None)'''
+        super().__init__()
+        models = []
+        for i in range(count):
+            if seed is not None:
+                torch.manual_seed(seed + i)
+            models.append(NeuralNetwork())
+
+        # weights as (models x in x out), so a layer is bias + x @ weight for all models in one baddbmm
+        self.weights = nn.ParameterList([torch.stack([getattr(m, layer).weight.detach().t() for m in models])
+                                         for layer in self.layers])
+        self.biases = nn.ParameterList([torch.stack([getattr(m, layer).bias.detach().unsqueeze(0) for m in models])
+                                        for layer in self.layers])
+        self.act = nn.ReLU()
+
+
+    def __len__(self):
+        return len(self.weights[0])
+
+
+    def forward(self, x):
+        '''Parameters: x : torch.Tensor, (samples x 18) given to every model, or (models x samples x 18), a batch per model
+            Return:     torch.Tensor (models x samples x 1) of logits'''
+        if x.dim() == 2:
+            x = x.expand(len(self), -1, -1)
+        for i, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+            x = torch.baddbmm(bias, x, weight)
+            if i < len(self.layers) - 1:
+                x = self.act(x)
+        return x
+
+
+    def state_dicts(self):
+        '''Return:     list of state_dicts, one per model, that NeuralNetwork.load_state_dict reads'''
+        state_dicts = [{} for _ in range(len(self))]
+        for layer, weight, bias in zip(self.layers, self.weights, self.biases):
+            for i, state in enumerate(state_dicts):
+                state[layer + ".weight"] = weight[i].detach().t().contiguous()
+                state[layer + ".bias"] = bias[i, 0].detach().clone()
+        return state_dicts
+
+
+    def to_models(self):
+        '''Return:     list of NeuralNetwork objects, the models as they are now'''
+        models = []
+        for state in self.state_dicts():
+            model = NeuralNetwork()
+            model.load_state_dict(state)
+            models.append(model)
+        return models
@@ -0,0 +1,76 @@
+# Title: SwitchSeries.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: v0.2 columnar time-series of a single switch
+
+import numpy as np
+
+
+class SwitchSeries:
+    # keys of the stats in the formatted data, in the same order as Grabber.stats
+    # can rename the last two later if we fix the data to report values as latency instead of ping_latency
+    keys = ["temp_avg", "temp_max", "cpu_avg", "cpu_max", "ping_latency_avg", "ping_latency_max"]
+
+    # stats that are read as integers, these get truncated the same way int() would
+    integer = [False, True, False, True, True, True]
+
+    def __init__(self, switch):
+        '''Turns one switch from Grabber.file_to_db into a dense (days x stats) array and a presence mask
+            Parameters: switch : dict, holding all info about one switch'''
+
+        self.name = switch.get("switch_name")
+        self.site_code = switch.get("site_code")
+        self.model = switch["model"]
+
+        columns = []
+        self.days = 0
+        for key in self.keys:                                           # read every stat once, keyed by int day
+            column = switch[key]
+            days = np.fromiter((int(day) for day in column.keys()), dtype=np.int64, count=len(column))
+            vals = np.fromiter((float(val) for val in column.values()), dtype=np.float64, count=len(column))
+            columns.append((days, vals))
+            if len(days):
+                self.days = max(self.days, int(days.max()) + 1)
+
+        # column-major so that the window of one stat is a contiguous slice
+        self.values = np.zeros((self.days, len(self.keys)), dtype=np.float64, order='F')
+        self.present = np.zeros((self.days, len(self.keys)), dtype=bool, order='F')
+
+        for col, (days, vals) in enumerate(columns):
+            keep = days >= 0
+            days = days[keep]
+            vals = vals[keep]
+            if self.integer[col]:
+                vals = np.trunc(vals)
+            self.values[days, col] = vals
+            self.present[days, col] = True
+
+        # validity index: complete[d] counts the days before d on which every stat is present,
+        # so a window is complete when this count grows by sample_len across it
+        self.complete = np.zeros(self.days + 1, dtype=np.int32)
+        np.cumsum(self.present.all(axis=1), out=self.complete[1:])
+
+
+    def window(self, day, sample_len):
+        '''Returns the (sample_len x stats) block of days preceding day, as a view into the series
+            Parameters: day : int, day the sample ends on (exclusive)
+                        sample_len : int, number of days in a sample
+            Return:     np.ndarray'''
+        return self.values[day - sample_len:day]
+
+
+    def is_complete(self, day, sample_len) -> bool:
+        '''Checks in O(1) that every stat is present for all sample_len days preceding day'''
+        if day > self.days or day - sample_len < 0:
+            return False
+        return bool(self.complete[day] - self.complete[day - sample_len] == sample_len)
+
+
+    def valid_end_days(self, sample_len):
+        '''Returns every day that a complete sample of sample_len days can end on
+            Parameters: sample_len : int, number of days in a sample
+            Return:     np.ndarray of int days, ascending'''
+        if sample_len > self.days:
+            return np.empty(0, dtype=np.int64)
+        counts = self.complete[sample_len:] - self.complete[:-sample_len]
+        return np.flatnonzero(counts == sample_len) + sample_len
@@ -0,0 +1,54 @@
+# Title: TensorBatcher.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: v0.2 batches of whole tensors, in place of DataLoader(TensorDataset(...)) without per-row collation
+
+import torch
+
+
+class TensorBatcher:
+    def __init__(self, *tensors, batch_size=1, shuffle=False, drop_last=False, generator=None):
+        '''Iterates over equal length tensors in batches, one permutation and one index_select per tensor per batch
+            Parameters: tensors : torch.Tensor, first dimension is the sample
+                        batch_size, shuffle, drop_last : same as for DataLoader
+                        generator : torch.Generator the order is drawn from (torch's global one if None)'''
+        if any(len(tensor) != len(tensors[0]) for tensor in tensors):
+            raise ValueError("all tensors must have the same number of samples")
+        self.tensors = tensors
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.generator = generator
+
+
+    def __len__(self):
+        samples = len(self.tensors[0])
+        if self.drop_last:
+            return samples // self.batch_size
+        return (samples + self.batch_size - 1) // self.batch_size
+
+
+    def order(self):
+        '''Sample order of one epoch, drawn from the random state the way DataLoader draws it (a seed for its
+            workers, then a seed for its RandomSampler), so a seeded run gets the same batches it got from DataLoader
+            Return:     torch.Tensor of indices'''
+        torch.empty((), dtype=torch.int64).random_(generator=self.generator)
+        seed = int(torch.empty((), dtype=torch.int64).random_(generator=self.generator).item())
+        generator = torch.Generator()
+        generator.manual_seed(seed)
+        return torch.randperm(len(self.tensors[0]), generator=generator)
+
+
+    def __iter__(self):
+        '''Yields a tuple of batches, one per tensor'''
+        end = len(self) * self.batch_size if self.drop_last else len(self.tensors[0])
+
+        if not self.shuffle:                                            # contiguous batches are views, no copy at all
+            for start in range(0, end, self.batch_size):
+                yield tuple(tensor[start:start + self.batch_size] for tensor in self.tensors)
+            return
+
+        order = self.order()                                            # drawn on the CPU, the same order on every device
+        orders = {tensor.device: order.to(tensor.device) for tensor in self.tensors}   # moved once per epoch
+        for start in range(0, end, self.batch_size):
+            yield tuple(tensor.index_select(0, orders[tensor.device][start:start + self.batch_size]) for tensor in self.tensors)
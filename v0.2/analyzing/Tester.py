@@ -10,10 +10,13 @@ import pandas as pd
 import numpy as np
 from torch.utils.data import DataLoader, TensorDataset
 from NeuralNetwork import NeuralNetwork
+from Dataset import Dataset
+from Normalizer import Normalizer
+from MetricAccumulator import MetricAccumulator
 
 class Tester(): 
     def __init__(self, data_path):
-        self.data_path = data_path + "/training/validation_v0.2_2023-1-1_2024-8-1.csv" 
+        self.data_path = data_path + "/training/validation_v0.2_2023-1-1_2024-8-1" 
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu' 
         self.parameters = ['temp_avg', 'temp_avg_stdev', 'temp_avg_slope',
                             'temp_max', 'temp_max_stdev', 'temp_max_slope',
@@ -22,14 +25,12 @@ class Tester():
                             'latency_avg', 'latency_avg_stdev', 'latency_avg_slope',
                             'latency_max', 'latency_max_stdev', 'latency_max_slope']
         self.threshold = 0.2
-        self.data = self.to_dataframe()
+        self.data = self.load_data()
+        self.normalizer = self.load_normalizer(data_path + "/training/normalization_v0.2_2023-1-1_2024-8-1.json")
 
 
     def test_model(self, model): 
-        inputs = self.parameters
-        x = torch.tensor(self.data[inputs].values,dtype=torch.float)
-        outputs = ['failing', 'row']
-        y = torch.tensor(self.data[outputs].values,dtype=torch.float)
+        x, y = self.to_tensors()
  
         dataset = TensorDataset(x, y)
         batch_size =  1000
@@ -38,11 +39,7 @@ class Tester():
         pos_weight = torch.tensor([0.03])
         criterion = torch.nn.BCEWithLogitsLoss(pos_weight=pos_weight)        # Measure our neural network by binary cross-entropy loss
 
-        total_loss = 0.0
-        true_positive = 0  
-        false_positive = 0
-        false_negative = 0
-        true_negative = 0
+        metrics = MetricAccumulator(self.device)                # sums stay on the device until the end
 
         with torch.no_grad():                                   # Disable gradient calculation
             i = 0
@@ -53,24 +50,17 @@ class Tester():
                 y_rows = batch_y[:,1]
                 
                 loss = criterion(y_pred, y_actual)                 # Measure how well the model predicted vs actual
-                total_loss += loss.item()                          # Track how well the model predict
 
-                #y_pred_binary = (y_pred > self.threshold).cpu().detach().numpy()   # Convert predictions and actuals to binary
-                #y_actual_binary = y_actual.cpu().detach().numpy()
+                #y_pred_binary = (y_pred > self.threshold)          # Convert predictions to binary
                 
-                y_pred_binary = (torch.sigmoid(y_pred) > self.threshold).float().cpu().detach().numpy()
-                y_actual_binary = y_actual.cpu().detach().numpy()
-                
-
-                # self.print_correct_pred(y_actual, y_rows, y_pred_binary, 0, i)
+                y_pred_binary = (torch.sigmoid(y_pred) > self.threshold).float()
+                metrics.add(loss, y_pred_binary, y_actual)         # Track how well the model predict
 
-                true_positive += ((y_pred_binary == 1) & (y_actual_binary == 1)).sum()
-                false_positive += ((y_pred_binary == 1) & (y_actual_binary == 0)).sum()
-                false_negative += ((y_pred_binary == 0) & (y_actual_binary == 1)).sum()
-                true_negative += ((y_pred_binary == 0) & (y_actual_binary == 0)).sum()
+                # self.print_correct_pred(y_actual, y_rows, y_pred_binary.cpu().numpy(), 0, i)
 
                 i += 1
 
+        total_loss, true_positive, false_positive, false_negative, true_negative = metrics.results()
         accuracy = (true_positive + true_negative) / (true_positive + true_negative + false_positive + false_negative) 
         precision = true_positive / (true_positive + false_positive) if (true_positive + false_positive) > 0 else 0
         recall = true_positive / (true_positive + false_negative) if (true_positive + false_negative) > 0 else 0
@@ -82,6 +72,19 @@ class Tester():
         print(f"True Positive: {true_positive}, False Positive: {false_positive}, True Negative: {true_negative}, False Negative: {false_negative}")
 
 
+    def predict(self, models, raw_features):
+        '''Scores raw (not normalized) stats, scaling them with the limits the models were trained with
+            Parameters:     models: list of NeuralNetwork objects, a single model is a list of one
+                            raw_features: np.ndarray (samples x parameters) of stats from FeatureEngine
+            Returns:        np.ndarray of booleans, True where the models vote that the switch will fail'''
+        x = torch.from_numpy(self.normalizer.transform(raw_features).astype(np.float32)).to(self.device)
+
+        with torch.no_grad():
+            votes = [(torch.sigmoid(model.to(self.device)(x)) > self.threshold) for model in models]
+            decisions, _ = torch.mode(torch.cat(votes, dim=1).int(), dim=1)
+        return decisions.cpu().numpy().astype(bool)
+
+
     def print_correct_pred(self, y_actual, y_rows, y_pred_binary, model_num, batch_num):
 
         y_actual_df = pd.DataFrame(y_actual.numpy().astype(int))  
@@ -97,10 +100,7 @@ class Tester():
 
 
     def test_ensemble(self, models):
-        inputs = self.parameters
-        x = torch.tensor(self.data[inputs].values,dtype=torch.float)
-        outputs = ['failing', 'row']
-        y = torch.tensor(self.data[outputs].values,dtype=torch.float)
+        x, y = self.to_tensors()
 
         dataset = TensorDataset(x, y)
         batch_size = 1000
@@ -113,11 +113,7 @@ class Tester():
         pos_weight = torch.tensor([0.03])
         criterion = torch.nn.BCEWithLogitsLoss(pos_weight=pos_weight)
 
-        total_loss = 0.0
-        true_positive = 0  
-        false_positive = 0
-        false_negative = 0
-        true_negative = 0
+        metrics = MetricAccumulator(self.device)
 
         with torch.no_grad():
             i = 0
@@ -125,7 +121,7 @@ class Tester():
                 i += 1
                 batch_x, batch_y = batch_x.to(self.device), batch_y.to(self.device)
 
-                votes = torch.empty((len(batch_x), 0), dtype=torch.bool)
+                votes = torch.empty((len(batch_x), 0), dtype=torch.bool, device=batch_x.device)
 
                 for j, model in enumerate(models):
                     y_pred = model(batch_x)
@@ -133,10 +129,9 @@ class Tester():
                     y_rows = batch_y[:,1]
                     
                     loss = criterion(y_pred, y_actual)                 # Measure how well the model predicted vs actual
-                    total_loss += loss.item()                          # Track how well the model predict
+                    metrics.add_loss(loss)                             # Track how well the model predict
 
                     y_pred_binary = (torch.sigmoid(y_pred) > self.threshold)
-                    y_actual_binary = y_actual.cpu().detach().numpy()
 
                     votes = torch.cat((votes, y_pred_binary), dim=1).int()
 
@@ -144,14 +139,9 @@ class Tester():
                  
                 decisions, _ = torch.mode(votes, dim=1)
                 decisions = decisions.unsqueeze(1)
-                y_pred_voted = decisions.cpu().detach().numpy().astype(int)
-                y_actual_binary = y_actual.cpu().detach().numpy().astype(int)
-               
-                true_positive += ((y_pred_voted == 1) & (y_actual_binary == 1)).sum()
-                false_positive += ((y_pred_voted == 1) & (y_actual_binary == 0)).sum()
-                false_negative += ((y_pred_voted == 0) & (y_actual_binary == 1)).sum()
-                true_negative += ((y_pred_voted == 0) & (y_actual_binary == 0)).sum()
+                metrics.add(None, decisions, y_actual.int())
 
+        total_loss, true_positive, false_positive, false_negative, true_negative = metrics.results()
         accuracy = (true_positive + true_negative) / (true_positive + true_negative + false_positive + false_negative)
         precision = true_positive / (true_positive + false_positive) if (true_positive + false_positive) > 0 else 0
         recall = true_positive / (true_positive + false_negative) if (true_positive + false_negative) > 0 else 0
@@ -170,9 +160,40 @@ class Tester():
 # ========================================================================================================================================================
  
 
+    def load_data(self):
+        '''Loads the validation dataset, from its binary file if Grabber wrote one and from its csv file otherwise'''
+        if os.path.exists(self.data_path + ".bin"):
+            return Dataset.load(self.data_path + ".bin")
+        return Dataset.from_dataframe(self.to_dataframe(), self.parameters)
+
+
+    def load_normalizer(self, path):
+        '''Returns the limits the data was normalized with, None if they are unknown'''
+        if self.data.upper_limits is not None:                                  # binary datasets carry their limits
+            return Normalizer(self.data.parameters, self.data.upper_limits, self.data.lower_limits)
+        if os.path.exists(path):
+            return Normalizer.load(path)
+        return None
+
+
+    def model_normalizer(self, model_dir):
+        '''Switches to the limits saved next to a model by Trainer.save_model, if there are any'''
+        path = os.path.join(model_dir, "normalization.json")
+        if os.path.exists(path):
+            self.normalizer = Normalizer.load(path)
+
+
+    def to_tensors(self):
+        '''Returns the inputs, and the labels next to their 1-based row numbers'''
+        x = torch.from_numpy(self.data.features)                           # shares memory with the (memory-mapped) dataset
+        rows = torch.arange(1, len(self.data) + 1, dtype=torch.float)
+        y = torch.stack((torch.from_numpy(self.data.failing).float(), rows), dim=1)
+        return x, y
+
+
     def to_dataframe(self):
         columns = ['failing', 'model'] + self.parameters + ['name']
-        df = pd.read_csv(self.data_path, names=columns)
+        df = pd.read_csv(self.data_path + ".csv", names=columns)
         df['row'] = df.index + 1
         return df  
 
@@ -185,12 +206,13 @@ class Tester():
         model = NeuralNetwork()                           # create empty model
         model.load_state_dict(torch.load(model_path))     # load a static dict with trained parameters from file to the model
         model.eval()                                      # set model to evaluation mode
+        self.model_normalizer(os.path.dirname(model_path))
         return model
  
  
     def load_ensemble(self, ensemble_path):
         models = []
-        model_filenames = [f for f in os.listdir(ensemble_path) if os.path.isfile(os.path.join(ensemble_path, f))]
+        model_filenames = [f for f in os.listdir(ensemble_path) if os.path.isfile(os.path.join(ensemble_path, f)) and f.endswith(".pt")]
         model_filenames.sort()
         for filename in model_filenames:
             print(filename)
@@ -199,4 +221,5 @@ class Tester():
             model.load_state_dict(torch.load(path))         # load a static dict with trained parameters from file to the model
             model.eval()                                    # set model to evaluation mode
             models.append(model)
+        self.model_normalizer(ensemble_path)
         return models
\ No newline at end of file
@@ -3,17 +3,25 @@
 # Created: 2024-07-09
 # Description: 
 
+import os
 import torch  
 import torch.nn as nn
 import torch.optim as optim
 import pandas as pd
 import numpy as np
-from torch.utils.data import DataLoader, TensorDataset
 from NeuralNetwork import NeuralNetwork
+from Dataset import Dataset
+from Normalizer import Normalizer
+from TensorBatcher import TensorBatcher
+from MetricAccumulator import MetricAccumulator
+from StackedAdam import StackedAdam
 
 
 class Trainer():  
-    def __init__(self, path):
+    def __init__(self, path, train_data=None, val_data=None):
+        '''Loads the training and validation datasets from path, unless they are given
+            Parameters:     path: str, database directory
+                            train_data, val_data: Dataset objects already in memory (e.g. shared by EnsembleTrainer)'''
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu' 
         self.parameters = [ 'temp_avg', 'temp_avg_stdev', 'temp_avg_slope',
                             'temp_max', 'temp_max_stdev', 'temp_max_slope',
@@ -22,11 +30,12 @@ class Trainer():
                             'latency_avg', 'latency_avg_stdev', 'latency_avg_slope', 
                             'latency_max', 'latency_max_stdev', 'latency_max_slope']
         
-        train_path = path + "/training/training_v0.2_2023-1-1_2024-8-1.csv"
-        val_path = path + "/training/validation_v0.2_2023-1-1_2024-8-1.csv"
+        train_path = path + "/training/training_v0.2_2023-1-1_2024-8-1"
+        val_path = path + "/training/validation_v0.2_2023-1-1_2024-8-1"
  
-        self.train_data = self.to_dataframe(train_path)
-        self.val_data = self.to_dataframe(val_path)
+        self.train_data = train_data if train_data is not None else self.load_data(train_path)
+        self.val_data = val_data if val_data is not None else self.load_data(val_path)
+        self.normalizer = self.load_normalizer(path + "/training/normalization_v0.2_2023-1-1_2024-8-1.json")
         
 
     def create_model(self):
@@ -35,24 +44,22 @@ class Trainer():
         return model 
     
 
-    def train_model(self, model, epochs):
-        '''Trains a neural network using a numpy data given
+    def train_model(self, model, epochs, checkpoint_path=None, checkpoint_every=10, resume=False):
+        '''Trains a neural network on the training data, restoring the weights of its best epoch if it stops early
             Parameters:     model: NeuralNetwork   
-                            data: numpy array of training data
+                            epochs: int, total number of epochs, those done before a resume included
+                            checkpoint_path: str, file the full training state is saved to (no checkpoints if None)
+                            checkpoint_every: int, epochs between checkpoints
+                            resume: bool, continue from the checkpoint at checkpoint_path, if there is one
             Returns:        none''' 
 
-        inputs = self.parameters
-        outputs = ['failing'] 
-
-        x = torch.tensor(self.train_data[inputs].values,dtype=torch.float)
-        y = torch.tensor(self.train_data[outputs].values,dtype=torch.float)
-        dataset = TensorDataset(x, y)
-        dataloader = DataLoader(dataset, batch_size=2069, shuffle=True, drop_last=True)
+        x = torch.from_numpy(self.train_data.features).to(self.device)     # shares memory with the (memory-mapped) dataset on CPU
+        y = torch.from_numpy(self.train_data.failing).float().unsqueeze(1).to(self.device)
+        dataloader = TensorBatcher(x, y, batch_size=2069, shuffle=True, drop_last=True)
         
-        val_x = torch.tensor(self.val_data[inputs].values,dtype=torch.float)
-        val_y = torch.tensor(self.val_data[outputs].values,dtype=torch.float)
-        val_dataset = dataset = TensorDataset(val_x, val_y)
-        val_dataloader = DataLoader(val_dataset, batch_size=1000, shuffle=True, drop_last=True)
+        val_x = torch.from_numpy(self.val_data.features).to(self.device)
+        val_y = torch.from_numpy(self.val_data.failing).float().unsqueeze(1).to(self.device)
+        val_dataloader = TensorBatcher(val_x, val_y, batch_size=1000, shuffle=True, drop_last=True)
 
         model.to(self.device)
         #criterion = torch.nn.BCELoss()
@@ -68,15 +75,23 @@ class Trainer():
         stop_patience = 30
         best_performance = float('inf')
         bad_streak = 0
+        best_epoch = 0
+        best_weights = None
+        start_epoch = 0
+
+        if resume and checkpoint_path is not None and os.path.exists(checkpoint_path):
+            checkpoint = self.load_checkpoint(checkpoint_path, model, optimizer, scheduler)
+            start_epoch = checkpoint["epoch"]
+            best_performance, bad_streak = checkpoint["best_performance"], checkpoint["bad_streak"]
+            best_epoch, best_weights = checkpoint["best_epoch"], checkpoint["best_weights"]
+            print(f"...Resuming after epoch {start_epoch}...")
+            if checkpoint["stopped"]:                                                   # the run had already stopped early
+                return
 
         # MASTER LOOP
-        for epoch in range(epochs):
-            true_positive = 0    
-            false_positive = 0
-            false_negative = 0  
-            true_negative = 0   
-            total_loss = 0.0
-            val_loss = 0.0
+        for epoch in range(start_epoch, epochs):
+            metrics = MetricAccumulator(self.device)                                   # sums stay on the device until the epoch ends
+            val_metrics = MetricAccumulator(self.device)
              
             current_lr = optimizer.param_groups[0]['lr']
             print(f'=== Epoch {epoch+1}: Current LR: {current_lr} ===')
@@ -84,46 +99,31 @@ class Trainer():
             # TRAINING LOOP
             for batch_x, batch_y in dataloader:
                 optimizer.zero_grad()                                                   # predict
-                batch_x, batch_y = batch_x.to(self.device), batch_y.to(self.device)
                 y_pred = model(batch_x)
                 y_actual = batch_y[:, 0].unsqueeze(1)
                 loss = criterion(y_pred, y_actual)                                      # optimize
-                total_loss += loss.item()
                 loss.backward() 
                 optimizer.step()
 
-                # y_pred_binary = torch.round(y_pred).cpu().detach().numpy()              # convert predictions to binary, move to CPU
-                min_value = y_pred.min()
-                max_value = y_pred.max()
-                y_pred_binary = (torch.sigmoid(y_pred) > 0.5).float().cpu().detach().numpy()
-                y_actual_binary = y_actual.cpu().detach().numpy()
-                
-                true_positive += ((y_pred_binary == 1) & (y_actual_binary == 1)).sum()
-                false_positive += ((y_pred_binary == 1) & (y_actual_binary == 0)).sum()
-                false_negative += ((y_pred_binary == 0) & (y_actual_binary == 1)).sum()
-                true_negative += ((y_pred_binary == 0) & (y_actual_binary == 0)).sum()
+                # y_pred_binary = torch.round(y_pred)                                   # convert predictions to binary
+                y_pred_binary = (torch.sigmoid(y_pred) > 0.5).float()
+                metrics.add(loss, y_pred_binary, y_actual)
 
             # VALIDATION LOOP
-            val_tp = 0
-            val_fp = 0
-            
             for batch_x, batch_y in val_dataloader:
-                batch_x, batch_y = batch_x.to(self.device), batch_y.to(self.device)
                 y_pred = model(batch_x)
                 y_actual = batch_y[:, 0].unsqueeze(1)
 
                 loss = criterion(y_pred, y_actual)
-                val_loss += loss.item()
 
                 min_value = y_pred.min()
                 max_value = y_pred.max()
                 y_pred_binary = (y_pred - min_value) / (max_value - min_value)
-                y_pred_binary = torch.round(y_pred_binary).cpu().detach().numpy()
-                y_actual_binary = y_actual.cpu().detach().numpy()
-
-                val_tp += ((y_pred_binary == 1) & (y_actual_binary == 1)).sum()
-                val_fp += ((y_pred_binary == 1) & (y_actual_binary == 0)).sum()
+                y_pred_binary = torch.round(y_pred_binary)
+                val_metrics.add(loss, y_pred_binary, y_actual)
 
+            total_loss, true_positive, false_positive, false_negative, true_negative = metrics.results()
+            val_loss, val_tp, val_fp, _, _ = val_metrics.results()
             val_precision = val_tp / (val_tp + val_fp)
             val_performance = 1 - val_precision
 
@@ -131,10 +131,18 @@ class Trainer():
             if total_loss < best_performance:
                 best_performance = total_loss
                 bad_streak = 0
+                best_epoch = epoch + 1
+                best_weights = {key: value.detach().clone() for key, value in model.state_dict().items()}
             else:
                 bad_streak += 1
                 if bad_streak >= stop_patience:
                     print(f"========== EARLY STOP ==========")
+                    if best_weights is not None:
+                        model.load_state_dict(best_weights)
+                        print(f"Restored weights of epoch {best_epoch}, Total Loss: {best_performance}")
+                    if checkpoint_path is not None:
+                        self.save_checkpoint(checkpoint_path, model, optimizer, scheduler, epoch + 1, best_performance,
+                                             bad_streak, best_epoch, best_weights, stopped=True)
                     break
 
             scheduler.step(total_loss)
@@ -150,12 +158,163 @@ class Trainer():
             print(f"Accuracy: {accuracy:.4f}, Precision: {precision:.4f}, Recall: {recall:.4f}, F1 Score: {f1_score:.4f}")
             print(f"True Positive: {true_positive}, False Positive: {false_positive}, True Negative: {true_negative}, False Negative: {false_negative}")
 
+            if checkpoint_path is not None and ((epoch + 1) % checkpoint_every == 0 or epoch + 1 == epochs):
+                self.save_checkpoint(checkpoint_path, model, optimizer, scheduler, epoch + 1, best_performance,
+                                     bad_streak, best_epoch, best_weights)
+
+
+    def train_stacked(self, ensemble, epochs, bootstrap=False):
+        '''Trains every model of a StackedEnsemble at once, like train_model but with a batched forward and backward pass
+           for all of them, each model keeping its own batch order, learning rate schedule and early stop.
+           A stopped model still goes through the batched forward and backward passes (slicing it out of the stacked
+           weights would cost a copy per batch), its learning rate is 0 so its weights are left as they are
+            Parameters:     ensemble: StackedEnsemble
+                            epochs: int
+                            bootstrap: bool, train each model on its own resample (with replacement) of the training data
+            Returns:        none'''
+        count = len(ensemble)
+        x = torch.from_numpy(self.train_data.features).to(self.device)
+        y = torch.from_numpy(self.train_data.failing).float().unsqueeze(1).to(self.device)
+        batch_size = 2069
+
+        val_x = torch.from_numpy(self.val_data.features).to(self.device)
+        val_y = torch.from_numpy(self.val_data.failing).float().unsqueeze(1).to(self.device)
+        val_dataloader = TensorBatcher(val_x, val_y, batch_size=1000, shuffle=True, drop_last=True)
+
+        if bootstrap:
+            samples = torch.randint(len(x), (count, len(x)), device=self.device)    # each model's rows, drawn once
+        else:
+            samples = torch.arange(len(x), device=self.device).expand(count, -1)
+
+        ensemble.to(self.device)
+        pos_weight = torch.tensor([0.03], device=self.device)
+        criterion = nn.BCEWithLogitsLoss(pos_weight=pos_weight, reduction='none')
+
+        optimizer = StackedAdam(ensemble.parameters())
+
+        # learning rate of every model, cut like train_model's ReduceLROnPlateau('min', patience=15, factor=0.1, min_lr=1e-7)
+        lr = np.full(count, 0.001)
+        plateau_best = np.full(count, float('inf'))
+        plateau_streak = np.zeros(count, dtype=int)
+
+        # early stopping parameters, per model
+        stop_patience = 30
+        best_performance = np.full(count, float('inf'))
+        bad_streak = np.zeros(count, dtype=int)
+        best_epoch = np.zeros(count, dtype=int)
+        best_weights = [p.detach().clone() for p in ensemble.parameters()]          # every model's weights at its best epoch
+        active = np.ones(count, dtype=bool)
+
+        # MASTER LOOP
+        for epoch in range(epochs):
+            current_lr = lr.copy()
+            step_lr = torch.tensor(current_lr * active, dtype=torch.float32, device=self.device).view(-1, 1, 1)
+            metrics = MetricAccumulator(self.device, count)
+            val_metrics = MetricAccumulator(self.device, count)
+            print(f'=== Epoch {epoch+1}: {active.sum()} of {count} models training ===')
+
+            # TRAINING LOOP
+            order = torch.gather(samples, 1, torch.argsort(torch.rand(count, len(x), device=self.device), dim=1))
+            for start in range(0, len(x) - batch_size + 1, batch_size):
+                indices = order[:, start:start + batch_size]
+                batch_x, y_actual = x[indices], y[indices]                              # (models x batch x ...)
+
+                optimizer.zero_grad()                                                   # predict
+                y_pred = ensemble(batch_x)
+                loss = criterion(y_pred, y_actual).mean(dim=(1, 2))                     # mean loss of every model
+                loss.sum().backward()                                                   # models share no weights, so each gets its own gradient
+                optimizer.step(step_lr)                                                 # optimize, stopped models have a step of 0
+
+                y_pred_binary = (torch.sigmoid(y_pred) > 0.5).float()
+                metrics.add(loss, y_pred_binary, y_actual)
+
+            # VALIDATION LOOP
+            with torch.no_grad():
+                for batch_x, batch_y in val_dataloader:
+                    y_pred = ensemble(batch_x)
+                    y_actual = batch_y[:, 0].unsqueeze(1).expand(count, -1, -1)
+                    loss = criterion(y_pred, y_actual).mean(dim=(1, 2))
+
+                    min_value = y_pred.amin(dim=(1, 2), keepdim=True)
+                    max_value = y_pred.amax(dim=(1, 2), keepdim=True)
+                    y_pred_binary = torch.round((y_pred - min_value) / (max_value - min_value))
+                    val_metrics.add(loss, y_pred_binary, y_actual)
+
+            total_loss, true_positive, false_positive, false_negative, true_negative = metrics.results()
+            val_loss, val_tp, val_fp, _, _ = val_metrics.results()
+
+            for i in np.flatnonzero(active):
+                # learning rate and early stopping
+                if total_loss[i] < best_performance[i]:
+                    best_performance[i] = total_loss[i]
+                    bad_streak[i] = 0
+                    best_epoch[i] = epoch + 1
+                    with torch.no_grad():
+                        for best, p in zip(best_weights, ensemble.parameters()):
+                            best[i] = p[i]
+                else:
+                    bad_streak[i] += 1
+                    if bad_streak[i] >= stop_patience:
+                        print(f"========== EARLY STOP: MODEL {i+1} ==========")
+                        with torch.no_grad():
+                            for best, p in zip(best_weights, ensemble.parameters()):
+                                p[i] = best[i]
+                        print(f"Restored weights of epoch {best_epoch[i]}, Total Loss: {best_performance[i]}")
+                        active[i] = False
+                        continue
+
+                if total_loss[i] < plateau_best[i] * (1 - 1e-4):                      # relative threshold of ReduceLROnPlateau
+                    plateau_best[i] = total_loss[i]
+                    plateau_streak[i] = 0
+                else:
+                    plateau_streak[i] += 1
+                if plateau_streak[i] > 15:
+                    reduced = max(lr[i] * 0.1, 1e-7)
+                    if lr[i] - reduced > 1e-8:
+                        lr[i] = reduced
+                    plateau_streak[i] = 0
+
+                # outputs
+                tp, fp, fn, tn = true_positive[i], false_positive[i], false_negative[i], true_negative[i]
+                accuracy = (tp + tn) / (tp + tn + fp + fn)
+                precision = tp / (tp + fp) if (tp + fp) > 0 else 0
+                recall = tp / (tp + fn) if (tp + fn) > 0 else 0
+                f1_score = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
+                val_precision = val_tp[i] / (val_tp[i] + val_fp[i])
+
+                print(f"Model {i+1} (LR: {current_lr[i]}): Total Loss: {total_loss[i]}, Val Loss: {val_loss[i]}, Val Precision: {val_precision}")
+                print(f"    Accuracy: {accuracy:.4f}, Precision: {precision:.4f}, Recall: {recall:.4f}, F1 Score: {f1_score:.4f}")
+                print(f"    True Positive: {tp}, False Positive: {fp}, True Negative: {tn}, False Negative: {fn}")
+
+            if not active.any():
+                break
+
 
 # ========================================================================================================================================================
 # I/O FUNCTIONS
 # ========================================================================================================================================================
 
 
+    def load_data(self, path):
+        '''Loads a dataset, from its binary file if Grabber wrote one and from its csv file otherwise
+            Parameters:     path: str, path to the dataset without extension
+            Returns:        Dataset object'''
+        if os.path.exists(path + ".bin"):
+            return Dataset.load(path + ".bin")
+        return Dataset.from_dataframe(self.to_dataframe(path + ".csv"), self.parameters)
+
+
+    def load_normalizer(self, path):
+        '''Returns the limits the training data was normalized with, None if they are unknown
+            Parameters:     path: str, path to the normalization file written by Grabber
+            Returns:        Normalizer object or None'''
+        if self.train_data.upper_limits is not None:                            # binary datasets carry their limits
+            return Normalizer(self.train_data.parameters, self.train_data.upper_limits, self.train_data.lower_limits)
+        if os.path.exists(path):
+            return Normalizer.load(path)
+        return None
+
+
     def to_dataframe(self, path):
         columns = ['failing', 'model'] + self.parameters + ['name']
         df = pd.read_csv(path, names=columns)
@@ -168,6 +327,42 @@ class Trainer():
                            path: str, path to the model file
            Returns:        None'''
         torch.save(model.state_dict(), path)
+        if self.normalizer is not None:                                         # inputs to this model must be scaled the same way
+            self.normalizer.save(os.path.join(os.path.dirname(path), "normalization.json"))
+
+
+    def save_checkpoint(self, path, model, optimizer, scheduler, epoch, best_performance, bad_streak, best_epoch,
+                        best_weights, stopped=False):
+        '''Saves everything train_model needs to carry on after epoch, replacing the last checkpoint only once the new one
+           is fully written
+            Parameters:     path: str, path to the checkpoint file
+                            model, optimizer, scheduler: as trained by train_model
+                            epoch: int, epochs done
+                            best_performance, bad_streak, best_epoch, best_weights: early stopping state
+                            stopped: bool, True if training stopped early
+            Returns:        none'''
+        checkpoint = {"epoch": epoch, "model": model.state_dict(), "optimizer": optimizer.state_dict(),
+                      "scheduler": scheduler.state_dict(), "best_performance": best_performance, "bad_streak": bad_streak,
+                      "best_epoch": best_epoch, "best_weights": best_weights, "stopped": stopped,
+                      "rng_state": torch.get_rng_state(),                               # batch order carries on as if never stopped
+                      "cuda_rng_state": torch.cuda.get_rng_state_all() if self.device == 'cuda' else None}
+        torch.save(checkpoint, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+
+    def load_checkpoint(self, path, model, optimizer, scheduler):
+        '''Loads a checkpoint written by save_checkpoint into model, optimizer and scheduler
+            Parameters:     path: str, path to the checkpoint file
+                            model, optimizer, scheduler: new ones, set up as train_model sets them up
+            Returns:        dict, the checkpoint (epoch and early stopping state)'''
+        checkpoint = torch.load(path, map_location=self.device)
+        model.load_state_dict(checkpoint["model"])
+        optimizer.load_state_dict(checkpoint["optimizer"])
+        scheduler.load_state_dict(checkpoint["scheduler"])
+        torch.set_rng_state(checkpoint["rng_state"].cpu())
+        if checkpoint.get("cuda_rng_state") is not None and self.device == 'cuda':
+            torch.cuda.set_rng_state_all([state.cpu() for state in checkpoint["cuda_rng_state"]])
+        return checkpoint
 
 
     def load_model(self, path):
@@ -0,0 +1,84 @@
+# Title: benchmark.py
+# Authors: Sofiia Khutorna, Rem D'Ambrosio
+# Created: 2026-10-18
+# Description: v0.2 epoch time of Trainer.train_model's loop with DataLoader batches against TensorBatcher batches,
+#              and of an ensemble trained one model after another against StackedEnsemble
+
+import io
+import time
+import contextlib
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import DataLoader, TensorDataset
+from Trainer import Trainer
+from TensorBatcher import TensorBatcher
+from StackedEnsemble import StackedEnsemble
+
+
+DATA_PATH = '../v0.2/databases'
+EPOCHS = 5
+ENSEMBLE_SIZE = 10
+
+
+def time_epochs(trainer, make_batches, epochs):
+    '''Trains a new model over the training set like Trainer.train_model, without validation or outputs
+        Parameters: trainer : Trainer, holds the training data
+                    make_batches : function (x, y) -> iterable of (batch_x, batch_y)
+                    epochs : int, number of epochs timed
+        Return:     float, mean seconds per epoch'''
+    x = torch.from_numpy(trainer.train_data.features)
+    y = torch.from_numpy(trainer.train_data.failing).float().unsqueeze(1)
+    batches = make_batches(x, y)
+
+    model = trainer.create_model()
+    criterion = nn.BCEWithLogitsLoss(pos_weight=torch.tensor([0.03]))
+    optimizer = optim.Adam(model.parameters(), lr=0.001)
+
+    start = time.perf_counter()
+    for epoch in range(epochs):
+        for batch_x, batch_y in batches:
+            optimizer.zero_grad()
+            loss = criterion(model(batch_x), batch_y)
+            loss.backward()
+            optimizer.step()
+    return (time.perf_counter() - start) / epochs
+
+
+def time_ensemble(trainer, count, epochs):
+    '''Trains count models one after another with train_model, then all at once with train_stacked
+        Parameters: trainer : Trainer, holds the training and validation data
+                    count : int, models in the ensemble
+                    epochs : int, number of epochs timed
+        Return:     mean seconds per epoch of both ways'''
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for i in range(count):
+            trainer.train_model(trainer.create_model(), epochs)
+        separate = (time.perf_counter() - start) / epochs
+
+        start = time.perf_counter()
+        trainer.train_stacked(StackedEnsemble(count), epochs)
+        stacked = (time.perf_counter() - start) / epochs
+    return separate, stacked
+
+
+def main():
+    trainer = Trainer(DATA_PATH)
+    print(f"{len(trainer.train_data)} training samples, {EPOCHS} epochs each")
+
+    torch.manual_seed(0)
+    before = time_epochs(trainer, lambda x, y: DataLoader(TensorDataset(x, y), batch_size=2069, shuffle=True, drop_last=True), EPOCHS)
+    print(f"DataLoader:    {before * 1000:.1f} ms per epoch")
+
+    torch.manual_seed(0)
+    after = time_epochs(trainer, lambda x, y: TensorBatcher(x, y, batch_size=2069, shuffle=True, drop_last=True), EPOCHS)
+    print(f"TensorBatcher: {after * 1000:.1f} ms per epoch ({before / after:.1f}x)")
+
+    separate, stacked = time_ensemble(trainer, ENSEMBLE_SIZE, EPOCHS)
+    print(f"{ENSEMBLE_SIZE} models, one after another: {separate * 1000:.1f} ms per epoch")
+    print(f"{ENSEMBLE_SIZE} models, stacked:           {stacked * 1000:.1f} ms per epoch ({separate / stacked:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
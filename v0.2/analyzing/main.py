@@ -6,6 +6,9 @@
 from Grabber import Grabber
 from Trainer import Trainer  
 from Tester import Tester
+from EnsembleTrainer import EnsembleTrainer
+from StackedEnsemble import StackedEnsemble
+import os
 import argparse
  
 
@@ -13,6 +16,8 @@ DATA_PATH = '../v0.2/databases'
 SAMPLE_LEN = 14
 LABEL = 'v0.2_date_range'
 MODEL_PATH = '../v0.2/analyzing/models/ensemble1/model1.pt'
+CHECKPOINT_PATH = '../v0.2/analyzing/models/ensemble1/model1.checkpoint'        # not a .pt file, so load_ensemble skips it
+CHECKPOINT_EVERY = 10
 EPOCHS = 2000
 
 
@@ -20,36 +25,68 @@ def main():
     parser = argparse.ArgumentParser(description='building and training neural network')
     parser.add_argument('-gr', '--grab', type=bool, help='grab all samples', default=False)
     parser.add_argument('-tr', '--train', type=bool, help='training regular neural network', default=False)
+    parser.add_argument('-re', '--resume', type=bool, help='continue --train from the last checkpoint', default=False)
     parser.add_argument('-te', '--test', type=bool, help='testing nn model', default=False)
+    parser.add_argument('-en', '--train-ensemble', type=int, help='train this many models of the ensemble in parallel', default=0)
+    parser.add_argument('-st', '--stacked', type=bool, help='train the ensemble as one stacked model in this process', default=False)
+    parser.add_argument('-bo', '--bootstrap', type=bool, help='train each stacked model on its own resample of the training data', default=False)
+    parser.add_argument('-wo', '--workers', type=int, help='processes used to grab shards (1 if not given) or train ensemble models (all cores if not given) in parallel', default=None)
+    parser.add_argument('-csv', '--csv', type=bool, help='also write grabbed datasets as csv', default=False)
+    parser.add_argument('-ca', '--cache', type=bool, help='reuse samples of shards that did not change since the last grab', default=False)
+    parser.add_argument('-se', '--seed', type=int, help='seed of the training/validation split (random if not given), and of the first ensemble model (0 if not given)', default=None)
     args = parser.parse_args()
+    if args.resume and args.train_ensemble:             # only train_model keeps checkpoints
+        parser.error("--resume continues --train from its checkpoint, ensembles are not checkpointed")
 
     if args.grab:
-        grab()  
+        grab(args.workers or 1, args.csv, args.cache, args.seed)  
         
     if args.train:     
-        train()
+        train(args.resume)
+
+    if args.train_ensemble and args.stacked:
+        train_stacked(args.train_ensemble, args.seed or 0, args.bootstrap)
+    elif args.train_ensemble:
+        train_ensemble(args.train_ensemble, args.workers, args.seed or 0)
 
     if args.test:
         test()
   
   
-def grab():
+def grab(workers=1, write_csv=False, use_cache=False, seed=None):
     print("Grabbing samples...")
-    grabber = Grabber(DATA_PATH, SAMPLE_LEN)
+    grabber = Grabber(DATA_PATH, SAMPLE_LEN, workers, use_cache, seed)
     print("Writing to datasets...")
-    grabber.samples_to_file(LABEL)
+    grabber.samples_to_file(LABEL, write_csv)
     print("===Datasets updated===\n")
   
 
-def train():
+def train(resume=False):
     print("Training model...")
     trainer = Trainer(DATA_PATH)
        
     model = trainer.create_model()
     # model = trainer.load_model(MODEL_PATH)   
 
-    trainer.train_model(model, EPOCHS)
+    trainer.train_model(model, EPOCHS, CHECKPOINT_PATH, CHECKPOINT_EVERY, resume)
     trainer.save_model(model, MODEL_PATH)
+
+
+def train_ensemble(count, workers=1, seed=0):
+    print(f"Training {count} models...")
+    ensemble = EnsembleTrainer(DATA_PATH, workers)
+    ensemble.train(count, EPOCHS, os.path.dirname(MODEL_PATH), seed)
+
+
+def train_stacked(count, seed=0, bootstrap=False):
+    print(f"Training {count} stacked models...")
+    trainer = Trainer(DATA_PATH)
+    ensemble = StackedEnsemble(count, seed)
+
+    trainer.train_stacked(ensemble, EPOCHS, bootstrap)
+    os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
+    for i, model in enumerate(ensemble.to_models()):                # the usual ensemble layout, one file per model
+        trainer.save_model(model, os.path.join(os.path.dirname(MODEL_PATH), f"model{i + 1}.pt"))
  
 
 def test():